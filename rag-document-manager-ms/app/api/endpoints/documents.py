@@ -1,6 +1,5 @@
 from typing import List
-from fastapi import APIRouter, Depends, HTTPException, UploadFile
-from loguru import logger
+from fastapi import APIRouter, Depends, UploadFile
 
 from app.api.endpoints import schemas
 from app.core.dependencies.validation import validate_files_payload
@@ -17,17 +16,11 @@ router = APIRouter()
     description="Retrieves a list of unique filenames of all documents that have been processed and stored in the RAG vector store."
 )
 async def list_ingested_documents(document_service: DocumentService = Depends(get_document_service)):
-    try:
-        document_names = await document_service.get_all_document_names()
-        return schemas.DocumentListResponse(
-            count=len(document_names),
-            documents=document_names
-        )
-    except HTTPException as e:
-        raise e
-    except Exception as e:
-        logger.error(f"An unexpected error occurred while listing documents: {e}")
-        raise HTTPException(status_code=500, detail="An unexpected internal error occurred.")
+    document_names = await document_service.get_all_document_names()
+    return schemas.DocumentListResponse(
+        count=len(document_names),
+        documents=document_names
+    )
 
 
 @router.post(
@@ -40,23 +33,16 @@ async def ingest_documents_to_rag(
     files: List[UploadFile] = Depends(validate_files_payload),
     document_service: DocumentService = Depends(get_document_service)
 ):
-    try:
-        total_chunks, files_with_errors = await document_service.process_and_store_files(files)
-        
-        processed_count = len(files) - len(files_with_errors)
-
-        return schemas.RAGIngestionResponse(
-            total_chunks_added=total_chunks,
-            processed_files_count=processed_count,
-            files_with_errors=files_with_errors,
-            message=f"Ingestion process completed. Processed {processed_count} files successfully."
-        )
-
-    except HTTPException as e:
-        raise e
-    except Exception as e:
-        logger.error(f"Unexpected error during ingestion process : {e}")
-        raise HTTPException(status_code=500, detail="An unexpected internal error occurred.")
+    total_chunks, files_with_errors = await document_service.process_and_store_files(files)
+    
+    processed_count = len(files) - len(files_with_errors)
+
+    return schemas.RAGIngestionResponse(
+        total_chunks_added=total_chunks,
+        processed_files_count=processed_count,
+        files_with_errors=files_with_errors,
+        message=f"Ingestion process completed. Processed {processed_count} files successfully."
+    )
     
 @router.delete(
     "/documents/{filename}",
@@ -68,15 +54,8 @@ async def delete_document(
     filename: str,
     document_service: DocumentService = Depends(get_document_service)
 ):
-    try:
-        await document_service.delete_document_by_name(filename)
-        return schemas.DocumentDeleteResponse(
-            message="Document and all its associated chunks have been successfully deleted.",
-            deleted_filename=filename
-        )
-    except HTTPException as e:
-        # Przekaż wyjątki HTTP (np. 404) dalej
-        raise e
-    except Exception as e:
-        logger.error(f"An unexpected error occurred while deleting document '{filename}': {e}")
-        raise HTTPException(status_code=500, detail="An unexpected internal error occurred.")
\ No newline at end of file
+    await document_service.delete_document_by_name(filename)
+    return schemas.DocumentDeleteResponse(
+        message="Document and all its associated chunks have been successfully deleted.",
+        deleted_filename=filename
+    )
@@ -1,20 +1,28 @@
 from typing import List
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 
 class DocumentSnippet(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     filename: str
     content_snippet: List[str]
 
 class RAGIngestionResponse(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     total_chunks_added: int
     processed_files_count: int
     files_with_errors: List[str]
     message: str
 
 class DocumentListResponse(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     count: int
     documents: List[str]
     
 class DocumentDeleteResponse(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     message: str
     deleted_filename: str
\ No newline at end of file
@@ -1,3 +1,5 @@
+from typing import Literal
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
@@ -5,14 +7,30 @@ class Settings(BaseSettings):
     LOG_LEVEL: str = "INFO"
     MAX_FILE_SIZE_MB: int = 10
     MAX_FILES_COUNT: int = 5
+    THREADPOOL_SIZE: int = 64
 
     CHROMA_HOST: str = "localhost"
     CHROMA_PORT: int = 8000
+    CHROMA_HTTP_MAX_CONNECTIONS: int = 32
+    CHROMA_CONNECT_ATTEMPTS: int = 5
+    CHROMA_CONNECT_BACKOFF_SECONDS: float = 1.0
+    CHROMA_MAX_CONCURRENT_WRITES: int = 8
     RAG_COLLECTION_NAME: str = "rag_collection"
     HUGGINGFACEHUB_API_TOKEN: str
     HF_EMBEDDING_MODEL: str = "intfloat/multilingual-e5-large"
+    EMBEDDING_BACKEND: Literal["endpoint", "local"] = "endpoint"
+    EMBEDDING_LOCAL_RUNTIME: Literal["torch", "onnx"] = "torch"
+    EMBEDDING_LOCAL_DEVICE: str = "cpu"
+    EMBEDDING_MAX_TOKENS: int = 512
     TEXT_SPLITTER_CHUNK_SIZE: int = 1500
     TEXT_SPLITTER_CHUNK_OVERLAP: int = 200
+    TEXT_SPLITTER_LENGTH_UNIT: Literal["characters", "tokens"] = "characters"
+    EMBEDDING_BATCH_SIZE: int = 64
+    EMBEDDING_MAX_CONCURRENT_REQUESTS: int = 4
+    EMBEDDING_CACHE_CAPACITY: int = 10000
+    VECTOR_STORE_BATCH_SIZE: int = 200
+    SNIPPET_LENGTH: int = 200
+    FILENAME_INDEX_PATH: str = "filename_index.db"
 
     model_config = SettingsConfigDict(
         env_file=".env",
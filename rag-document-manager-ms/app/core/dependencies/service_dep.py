@@ -1,72 +1,154 @@
+import asyncio
 from functools import lru_cache
 import chromadb
-from fastapi import Depends, HTTPException
-from langchain_chroma import Chroma
-from langchain_huggingface import HuggingFaceEndpointEmbeddings
+from chromadb.config import Settings as ChromaSettings
+from chromadb.api.models.AsyncCollection import AsyncCollection
+from fastapi import Depends, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from langchain_huggingface import HuggingFaceEmbeddings, HuggingFaceEndpointEmbeddings
 from langchain_core.embeddings import Embeddings
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from loguru import logger
+from tokenizers import Tokenizer
 
 from app.core.config import settings
+from app.services.cached_embeddings import CachedEmbeddings
 from app.services.document_service import DocumentService
+from app.services.filename_index import FilenameIndex
 
-@lru_cache(maxsize=None)
-def get_settings():
-    return settings
+def _create_local_embeddings() -> Embeddings:
+    """Runs HF_EMBEDDING_MODEL in-process with sentence-transformers (plus optimum[onnxruntime] for ONNX)."""
+    return HuggingFaceEmbeddings(
+        model_name=settings.HF_EMBEDDING_MODEL,
+        model_kwargs={
+            "device": settings.EMBEDDING_LOCAL_DEVICE,
+            "backend": settings.EMBEDDING_LOCAL_RUNTIME,
+            "token": settings.HUGGINGFACEHUB_API_TOKEN
+        },
+        # The inference endpoint returns normalized vectors; keep the local ones comparable.
+        encode_kwargs={"batch_size": settings.EMBEDDING_BATCH_SIZE, "normalize_embeddings": True}
+    )
 
 @lru_cache(maxsize=None)
 def get_embeddings_model() -> Embeddings:
-    """Provides a singleton instance of the embeddings model."""
+    """Provides a singleton instance of the cached embeddings model selected by EMBEDDING_BACKEND."""
     try:
-        return HuggingFaceEndpointEmbeddings(
-            model=get_settings().HF_EMBEDDING_MODEL,
-            huggingfacehub_api_token=get_settings().HUGGINGFACEHUB_API_TOKEN
-        )
+        if settings.EMBEDDING_BACKEND == "local":
+            embeddings = _create_local_embeddings()
+        else:
+            embeddings = HuggingFaceEndpointEmbeddings(
+                model=settings.HF_EMBEDDING_MODEL,
+                huggingfacehub_api_token=settings.HUGGINGFACEHUB_API_TOKEN
+            )
+        return CachedEmbeddings(embeddings, capacity=settings.EMBEDDING_CACHE_CAPACITY)
     except Exception as e:
         logger.error(f"Failed to initialize embeddings model: {e}")
         raise HTTPException(status_code=503, detail="Embeddings service unavailable")
 
 @lru_cache(maxsize=None)
-def get_text_splitter() -> RecursiveCharacterTextSplitter:
-    """Provides a singleton of recursive character text splitter"""
-    return RecursiveCharacterTextSplitter(chunk_size=get_settings().TEXT_SPLITTER_CHUNK_SIZE,
-                                           chunk_overlap=get_settings().TEXT_SPLITTER_CHUNK_OVERLAP)
+def get_tokenizer() -> Tokenizer:
+    """Provides a singleton of the embedding model's fast (Rust) tokenizer."""
+    return Tokenizer.from_pretrained(
+        settings.HF_EMBEDDING_MODEL,
+        token=settings.HUGGINGFACEHUB_API_TOKEN
+    )
 
 @lru_cache(maxsize=None)
-def get_chroma_client() -> chromadb.HttpClient:
-    """Provides a singleton instance of the ChromaDB client."""
-    try:
-        client = chromadb.HttpClient(
-            host=get_settings().CHROMA_HOST, 
-            port=get_settings().CHROMA_PORT
+def get_text_splitter() -> RecursiveCharacterTextSplitter:
+    """Provides a singleton of recursive character text splitter, measuring in tokens if configured so."""
+    if settings.TEXT_SPLITTER_LENGTH_UNIT == "tokens":
+        tokenizer = get_tokenizer()
+        # The model adds its special tokens to every chunk; longer chunks would be silently truncated.
+        max_chunk_size = settings.EMBEDDING_MAX_TOKENS - len(tokenizer.encode(""))
+        chunk_size = settings.TEXT_SPLITTER_CHUNK_SIZE
+        if chunk_size > max_chunk_size:
+            logger.warning(
+                f"TEXT_SPLITTER_CHUNK_SIZE={chunk_size} exceeds the {max_chunk_size} tokens "
+                f"{settings.HF_EMBEDDING_MODEL} can embed; using {max_chunk_size}."
+            )
+            chunk_size = max_chunk_size
+        return RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size,
+            chunk_overlap=settings.TEXT_SPLITTER_CHUNK_OVERLAP,
+            length_function=lambda text: len(tokenizer.encode(text, add_special_tokens=False))
         )
-        # Connection test
-        client.heartbeat()
-        logger.info(f"Successfully connected to ChromaDB at {get_settings().CHROMA_HOST}:{get_settings().CHROMA_PORT}")
-        return client
-    except Exception as e:
-        logger.error(f"Failed to connect to ChromaDB: {e}")
-        raise HTTPException(status_code=503, detail="Vector database unavailable")
+
+    return RecursiveCharacterTextSplitter(chunk_size=settings.TEXT_SPLITTER_CHUNK_SIZE,
+                                           chunk_overlap=settings.TEXT_SPLITTER_CHUNK_OVERLAP)
+
+async def create_chroma_collection() -> AsyncCollection:
+    """Opens the RAG collection, retrying with exponential backoff while ChromaDB is still starting."""
+    for attempt in range(1, settings.CHROMA_CONNECT_ATTEMPTS + 1):
+        try:
+            client = await chromadb.AsyncHttpClient(
+                host=settings.CHROMA_HOST,
+                port=settings.CHROMA_PORT,
+                settings=ChromaSettings(
+                    chroma_http_max_connections=settings.CHROMA_HTTP_MAX_CONNECTIONS,
+                    chroma_http_max_keepalive_connections=settings.CHROMA_HTTP_MAX_CONNECTIONS
+                )
+            )
+            # Connection test
+            await client.heartbeat()
+            break
+        except Exception as e:
+            if attempt == settings.CHROMA_CONNECT_ATTEMPTS:
+                raise
+            delay = settings.CHROMA_CONNECT_BACKOFF_SECONDS * 2 ** (attempt - 1)
+            logger.warning(f"ChromaDB not reachable (attempt {attempt}/{settings.CHROMA_CONNECT_ATTEMPTS}), retrying in {delay:g}s: {e}")
+            await asyncio.sleep(delay)
+
+    logger.info(f"Successfully connected to ChromaDB at {settings.CHROMA_HOST}:{settings.CHROMA_PORT}")
+
+    # Embeddings are computed by the service, so the collection has no embedding function of its own.
+    collection = await client.get_or_create_collection(
+        name=settings.RAG_COLLECTION_NAME,
+        embedding_function=None
+    )
+    logger.info(f"Vector store initialized with collection: {settings.RAG_COLLECTION_NAME}")
+    return collection
+
+def get_chroma_collection(request: Request) -> AsyncCollection:
+    """Provides the collection opened in the application lifespan."""
+    return request.app.state.chroma_collection
 
 @lru_cache(maxsize=None)
-def get_vector_store() -> Chroma:
-    """Provides a singleton instance of the vector store, depending on the client and embeddings."""
-    try:
-        vector_store = Chroma(
-            client=get_chroma_client(),
-            collection_name=get_settings().RAG_COLLECTION_NAME,
-            embedding_function=get_embeddings_model()
-        )
-        logger.info(f"Vector store initialized with collection: {get_settings().RAG_COLLECTION_NAME}")
-        return vector_store
-    except Exception as e:
-        logger.error(f"Failed to initialize vector store: {e}")
-        raise HTTPException(status_code=503, detail="Vector store initialization failed")
-    
+def get_vector_store_write_semaphore() -> asyncio.Semaphore:
+    """Provides the semaphore shared by all requests to bound concurrent writes to ChromaDB."""
+    return asyncio.Semaphore(settings.CHROMA_MAX_CONCURRENT_WRITES)
+
 @lru_cache(maxsize=None)
+def get_filename_index() -> FilenameIndex:
+    """Provides a singleton instance of the filename index."""
+    return FilenameIndex(settings.FILENAME_INDEX_PATH)
+
+async def seed_filename_index(collection: AsyncCollection):
+    """Seeds a fresh filename index from the chunk metadata already stored in the collection."""
+    filename_index = get_filename_index()
+    if not await run_in_threadpool(filename_index.is_empty):
+        return
+    metadatas = (await collection.get(include=["metadatas"])).get("metadatas") or []
+    await run_in_threadpool(
+        filename_index.add,
+        {m["original_filename"] for m in metadatas if m and "original_filename" in m}
+    )
+    logger.info(f"Filename index seeded from collection: {settings.RAG_COLLECTION_NAME}")
+
 def get_document_service(
-    vector_store: Chroma = Depends(get_vector_store),
-    text_splitter: RecursiveCharacterTextSplitter = Depends(get_text_splitter)
+    collection: AsyncCollection = Depends(get_chroma_collection),
+    text_splitter: RecursiveCharacterTextSplitter = Depends(get_text_splitter),
+    embeddings_model: Embeddings = Depends(get_embeddings_model),
+    filename_index: FilenameIndex = Depends(get_filename_index),
+    write_semaphore: asyncio.Semaphore = Depends(get_vector_store_write_semaphore)
 ) -> DocumentService:
-    """Provides a singleton instance of the DocumentService."""
-    return DocumentService(vector_store=vector_store, text_splitter=text_splitter)
\ No newline at end of file
+    """
+    Provides a DocumentService per request. Its heavy components are the cached singletons
+    above, so constructing it is cheap.
+    """
+    return DocumentService(
+        collection=collection,
+        text_splitter=text_splitter,
+        embeddings_model=embeddings_model,
+        filename_index=filename_index,
+        write_semaphore=write_semaphore
+    )
\ No newline at end of file
@@ -1,4 +1,4 @@
-
+import os
 from typing import List
 
 from fastapi import Depends, File, HTTPException, UploadFile, status
@@ -6,16 +6,33 @@ from app.core.config import Settings, settings
 from loguru import logger
 
 
-SUPPORTED_CONTENT_TYPES = [
+SUPPORTED_CONTENT_TYPES = frozenset({
     "text/plain",
     "application/pdf",
     "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
     "application/epub+zip",
-]
+})
+
+# Allowance for multipart boundaries and part headers on top of the file payloads.
+MULTIPART_OVERHEAD_BYTES = 1024 * 1024
 
 def get_settings() -> Settings:
     return settings
 
+def max_request_body_bytes(settings: Settings) -> int:
+    """Largest request body a valid upload of MAX_FILES_COUNT files can produce."""
+    return settings.MAX_FILES_COUNT * settings.MAX_FILE_SIZE_MB * 1024 * 1024 + MULTIPART_OVERHEAD_BYTES
+
+def _upload_size(file: UploadFile) -> int:
+    """Size of the upload, measured on the spooled file when the multipart part carried none."""
+    if file.size is not None:
+        return file.size
+    position = file.file.tell()
+    file.file.seek(0, os.SEEK_END)
+    size = file.file.tell()
+    file.file.seek(position)
+    return size
+
 async def validate_files_payload(
     files: List[UploadFile] = File(...),
     settings: Settings = Depends(get_settings)
@@ -27,17 +44,18 @@ async def validate_files_payload(
             detail=f"Too many files. Maximum allowed is {settings.MAX_FILES_COUNT}."
         )
 
+    max_file_bytes = settings.MAX_FILE_SIZE_MB * 1024 * 1024
     for file in files:
-        if file.size > settings.MAX_FILE_SIZE_MB * 1024 * 1024:
-            raise HTTPException(
-                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-                detail=f"File '{file.filename}' exceeds the size limit of {settings.MAX_FILE_SIZE_MB}MB."
-            )
         if file.content_type not in SUPPORTED_CONTENT_TYPES:
             raise HTTPException(
                 status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
                 detail=f"File '{file.filename}' has an unsupported type: {file.content_type}."
             )
+        if _upload_size(file) > max_file_bytes:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"File '{file.filename}' exceeds the size limit of {settings.MAX_FILE_SIZE_MB}MB."
+            )
     
     logger.info(f"Payload validation successful for {len(files)} files.")
     return files
\ No newline at end of file
@@ -1,17 +1,38 @@
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI
+import anyio
+from fastapi import FastAPI, Request, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
 from loguru import logger
 
 from app.api.endpoints import documents
 from app.core.config import settings
+from app.core.dependencies.service_dep import create_chroma_collection, seed_filename_index
+from app.core.dependencies.validation import max_request_body_bytes
 from app.core.logging_config import setup_logging
+from app.services.document_loader import warmup
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     setup_logging()
     logger.info(f"Starting up {settings.APP_NAME}...")
+    # run_in_threadpool borrows from AnyIO's default limiter; concurrent file parsing needs more than its 40 tokens.
+    anyio.to_thread.current_default_thread_limiter().total_tokens = settings.THREADPOOL_SIZE
+
+    try:
+        app.state.chroma_collection = await create_chroma_collection()
+        await seed_filename_index(app.state.chroma_collection)
+    except Exception as e:
+        logger.error(f"Failed to connect to ChromaDB: {e}")
+        raise
+
+    try:
+        await run_in_threadpool(warmup)
+        logger.info("Document loaders warmed up.")
+    except Exception as e:
+        logger.warning(f"Document loader warmup failed, the first upload will pay the load cost: {e}")
     yield
 
     logger.info("Shutting down...")
@@ -23,6 +44,28 @@ app = FastAPI(
 )
 
 
+@app.exception_handler(Exception)
+async def unhandled_exception_handler(request: Request, exc: Exception):
+    """Logs an error no endpoint handled and answers with a generic 500."""
+    logger.error(f"Unexpected error while handling {request.method} {request.url.path}: {exc}")
+    return JSONResponse(
+        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        content={"detail": "An unexpected internal error occurred."}
+    )
+
+
+@app.middleware("http")
+async def limit_request_body_size(request: Request, call_next):
+    """Rejects oversized uploads from the Content-Length header, before the body is read."""
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_request_body_bytes(settings):
+        logger.warning(f"Rejected request to {request.url.path} with Content-Length {content_length}.")
+        return JSONResponse(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            content={"detail": f"Request body exceeds the upload limit of {settings.MAX_FILES_COUNT} files of {settings.MAX_FILE_SIZE_MB}MB."}
+        )
+    return await call_next(request)
+
 app.include_router(documents.router, prefix="/api/v1", tags=["Documents"])
 
 @app.get("/health", tags=["Health Check"])
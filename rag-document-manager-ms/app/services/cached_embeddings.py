@@ -0,0 +1,85 @@
+import hashlib
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Dict, List
+
+from langchain_core.embeddings import Embeddings
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Wraps an embeddings model with a thread-safe LRU cache keyed by a hash of the text,
+    so chunks that were embedded before skip the round-trip to the embedding endpoint.
+    Texts repeated within one call (headers, footers) are sent to the model only once.
+    """
+
+    def __init__(self, embeddings: Embeddings, capacity: int):
+        self.embeddings = embeddings
+        self.capacity = capacity
+        # Vectors are kept as float32 arrays, which is what the endpoint returns,
+        # at a fraction of the memory of a list of Python floats.
+        self._cache: OrderedDict[bytes, array] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _cache_key(text: str) -> bytes:
+        return hashlib.sha256(text.encode()).digest()[:16]
+
+    def _lookup(self, keys: List[bytes]) -> List[array | None]:
+        vectors: List[array | None] = [None] * len(keys)
+        with self._lock:
+            for i, key in enumerate(keys):
+                vector = self._cache.get(key)
+                if vector is not None:
+                    self._cache.move_to_end(key)
+                    vectors[i] = vector
+        return vectors
+
+    @staticmethod
+    def _misses(keys: List[bytes], vectors: List[array | None]) -> Dict[bytes, List[int]]:
+        """Groups the positions of uncached texts by key, so repeated texts are embedded once."""
+        misses: Dict[bytes, List[int]] = {}
+        for i, vector in enumerate(vectors):
+            if vector is None:
+                misses.setdefault(keys[i], []).append(i)
+        return misses
+
+    def _store(self, vectors: List[array | None], misses: Dict[bytes, List[int]], embedded: List[List[float]]):
+        with self._lock:
+            for (key, positions), vector in zip(misses.items(), embedded):
+                stored = array("f", vector)
+                for i in positions:
+                    vectors[i] = stored
+                self._cache[key] = stored
+                self._cache.move_to_end(key)
+            while len(self._cache) > self.capacity:
+                self._cache.popitem(last=False)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [self._cache_key(text) for text in texts]
+        vectors = self._lookup(keys)
+
+        misses = self._misses(keys, vectors)
+        if misses:
+            embedded = self.embeddings.embed_documents([texts[positions[0]] for positions in misses.values()])
+            self._store(vectors, misses, embedded)
+
+        return [vector.tolist() for vector in vectors]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [self._cache_key(text) for text in texts]
+        vectors = self._lookup(keys)
+
+        misses = self._misses(keys, vectors)
+        if misses:
+            embedded = await self.embeddings.aembed_documents([texts[positions[0]] for positions in misses.values()])
+            self._store(vectors, misses, embedded)
+
+        return [vector.tolist() for vector in vectors]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await self.embeddings.aembed_query(text)
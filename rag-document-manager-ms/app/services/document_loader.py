@@ -1,39 +1,94 @@
+import importlib
+import io
+import os
 import pathlib
+import shutil
+import tempfile
+from types import MappingProxyType
+from typing import BinaryIO, Callable
 
+from docx import Document as DocxDocument
 from loguru import logger
 from langchain_core.documents import Document
 from langchain_community.document_loaders.epub import UnstructuredEPubLoader
-from langchain_community.document_loaders.pdf import PyPDFLoader
-from langchain_community.document_loaders.text import TextLoader
 from langchain_community.document_loaders.word_document import (
     UnstructuredWordDocumentLoader
 )
+from pypdf import PdfReader
+from unstructured.partition.docx import partition_docx
 
 
 class DocumentLoaderException(Exception):
     pass
 
+def _load_pdf(filename: str, stream: BinaryIO) -> list[Document]:
+    """Extract the text of every page straight from the upload stream."""
+    reader = PdfReader(stream, strict=False)
+    total_pages = len(reader.pages)
+    return [
+        Document(
+            page_content=page.extract_text(),
+            metadata={"source": filename, "page": i, "total_pages": total_pages}
+        )
+        for i, page in enumerate(reader.pages)
+    ]
+
+def _load_text(filename: str, stream: BinaryIO) -> list[Document]:
+    return [Document(page_content=stream.read().decode("utf-8"), metadata={"source": filename})]
+
+def _load_docx(filename: str, stream: BinaryIO) -> list[Document]:
+    """Partition the .docx straight from the stream, joined like the loader's "single" mode."""
+    elements = partition_docx(file=stream)
+    return [Document(page_content="\n\n".join(str(el) for el in elements), metadata={"source": filename})]
+
+def _load_via_temp_file(loader_cls) -> Callable[[str, BinaryIO], list[Document]]:
+    """
+    Wrap a path-based LangChain loader; the stream is copied to a temporary file first.
+    Only used where the parser needs a filename (EPUB via pandoc, legacy .doc via LibreOffice).
+    """
+    def load(filename: str, stream: BinaryIO) -> list[Document]:
+        with tempfile.NamedTemporaryFile(delete=False, suffix=f"_{filename}") as tmp:
+            shutil.copyfileobj(stream, tmp, 1024 * 1024)
+        try:
+            return loader_cls(tmp.name).load()
+        finally:
+            os.remove(tmp.name)
+    return load
+
 class DocumentLoader:
     """Loads in a document with a supported extension."""
 
-    supported_extensions = {
-        ".pdf": PyPDFLoader,
-        ".txt": TextLoader,
-        ".epub": UnstructuredEPubLoader,
-        ".docx": UnstructuredWordDocumentLoader,
-        ".doc": UnstructuredWordDocumentLoader,
-    }
-
-def load_document(temp_filepath: str) -> list[Document]:
-    """Load a file and return it as a list of documents."""
-    
-    ext = pathlib.Path(temp_filepath).suffix
+    supported_extensions = MappingProxyType({
+        ".pdf": _load_pdf,
+        ".txt": _load_text,
+        ".epub": _load_via_temp_file(UnstructuredEPubLoader),
+        ".docx": _load_docx,
+        ".doc": _load_via_temp_file(UnstructuredWordDocumentLoader),
+    })
+
+def warmup():
+    """
+    Pays unstructured's first-use costs at startup instead of on the first upload: imports the
+    EPUB partitioner (loaded lazily by its LangChain loader) and parses a tiny in-memory .docx,
+    which loads the NLP model used to classify paragraphs.
+    """
+    importlib.import_module("unstructured.partition.epub")
+
+    buffer = io.BytesIO()
+    document = DocxDocument()
+    document.add_paragraph("This sentence warms up the document parsers.")
+    document.save(buffer)
+    buffer.seek(0)
+    _load_docx("warmup.docx", buffer)
+
+def load_document(filename: str, stream: BinaryIO) -> list[Document]:
+    """Load an uploaded file from its stream and return it as a list of documents."""
+
+    ext = pathlib.Path(filename).suffix
     loader = DocumentLoader.supported_extensions.get(ext)
     if not loader:
         raise DocumentLoaderException(
             f"Invalid extension type {ext}, cannot load this type of file"
         )
 
-    loaded = loader(temp_filepath)
-    return loaded.load()
-
+    return loader(filename, stream)
@@ -1,182 +1,222 @@
 import asyncio
-from datetime import datetime
-import os
-import tempfile
-from typing import List
+from contextlib import aclosing
+from datetime import datetime, timezone
+import math
+from typing import AsyncIterator, List
+from uuid import uuid4
 from fastapi import HTTPException, UploadFile
 from fastapi.concurrency import run_in_threadpool
 from loguru import logger
-from langchain_chroma import Chroma
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+import numpy as np
+from chromadb.api.models.AsyncCollection import AsyncCollection
 from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from app.core.config import settings
 from app.services.document_loader import load_document
+from app.services.filename_index import FilenameIndex
 
 class DocumentService:
-    DOCUMENT_INDEX_ID = "__DOCUMENT_INDEX__"
-
-    def __init__(self, vector_store: Chroma,  text_splitter: RecursiveCharacterTextSplitter):
-        self.vector_store = vector_store
+    def __init__(
+        self,
+        collection: AsyncCollection,
+        text_splitter: RecursiveCharacterTextSplitter,
+        embeddings_model: Embeddings,
+        filename_index: FilenameIndex,
+        write_semaphore: asyncio.Semaphore
+    ):
+        self.collection = collection
         self.text_splitter = text_splitter
-        self.index_update_lock = asyncio.Lock()
-    
+        self.embeddings_model = embeddings_model
+        self.filename_index = filename_index
+        self.write_semaphore = write_semaphore
+
     async def get_all_document_names(self) -> List[str]:
         """
-        Fetches the list of document names from the dedicated index document.
+        Fetches the sorted list of document names from the local filename index.
         """
         try:
-            logger.info(f"Fetching index document with ID: {self.DOCUMENT_INDEX_ID}")
-            
-            def get_index_sync():
-                index_doc = self.vector_store.get(ids=[self.DOCUMENT_INDEX_ID], include=["metadatas"])
-                metadatas = index_doc.get('metadatas')
-                
-                if not metadatas:
-                    logger.warning("Index document not yet created. The database is likely empty.")
-                    return []
-                
-                filenames_str = metadatas[0].get('filenames', '')
-                if not filenames_str:
-                    return []
-                
-                filenames = filenames_str.split('|')
-                logger.success(f"Fetched {len(filenames)} document names from the index.")
-                return sorted(filenames)
-
-            return await run_in_threadpool(get_index_sync)
+            filenames = await run_in_threadpool(self.filename_index.names)
+            logger.success(f"Fetched {len(filenames)} document names from the index.")
+            return filenames
 
         except Exception as e:
-            logger.error(f"Failed to fetch document index from ChromaDB: {e}")
-            raise HTTPException(status_code=500, detail=f"Error reading index from the vector store: {e}")
-    
-    async def _update_document_index(self, new_filenames: List[str]):
-        """Internal function to update the document index."""
-        async with self.index_update_lock:
-            logger.info("Lock acquired. Updating file name index.")
-            current_filenames_list = await self.get_all_document_names()
-            current_filenames_set = set(current_filenames_list)
-            
-            truly_new_files = [f for f in new_filenames if f not in current_filenames_set]
-
-            if not truly_new_files:
-                logger.info("No new, unique filenames to add to the index.")
-                return
-
-            updated_list = current_filenames_list + truly_new_files
-            
-            def upsert_index_sync():
-                serialized_filenames = "|".join(updated_list)
-                index_doc = Document(
-                    page_content="This is an index document. Do not delete.",
-                    metadata={"filenames": serialized_filenames}
-                )
-                self.vector_store.add_documents(documents=[index_doc], ids=[self.DOCUMENT_INDEX_ID])
-                logger.success(f"Index updated. Added {len(truly_new_files)} new names.")
-
-            await run_in_threadpool(upsert_index_sync)
-
-    async def process_and_store_files(self, files: List[UploadFile]) -> tuple[int, List[str]]:
-        all_chunks = []
-        error_files = []
-        processed_filenames = []
-
-        for file in files:
+            logger.error(f"Failed to read the filename index: {e}")
+            raise HTTPException(status_code=500, detail=f"Error reading the document index: {e}")
+
+    async def _process_single_file(
+        self, file: UploadFile, semaphore: asyncio.Semaphore, ingestion_timestamp: str
+    ) -> tuple[str, List[Document] | None]:
+        """Loads and splits one uploaded file. Returns its name and chunks, or None for chunks if it failed."""
+        async with semaphore:
             try:
-                #Temporary file
-                with tempfile.NamedTemporaryFile(delete=False, suffix=f"_{file.filename}") as tmp:
-                    content = await file.read()
-                    tmp.write(content)
-                    tmp_path = tmp.name
-
-                logger.info(f"File processing: {file.filename}")
+                logger.debug("File processing: {}", file.filename)
 
                 def process_file_sync():
-                    docs = load_document(tmp_path)
+                    docs = load_document(file.filename, file.file)
+                    common_metadata = {
+                        'original_filename': file.filename,
+                        'ingestion_timestamp_utc': ingestion_timestamp
+                    }
+
+                    for doc in docs:
+                        doc.metadata.update(common_metadata)
                     chunks = self.text_splitter.split_documents(docs)
                     
-                    logger.info(f"Metadata inspection of the first fragment from the file '{file.filename}':")
-                    if chunks:
-                        print(chunks[0].metadata)
-                    
-                    for chunk in chunks:
-                        chunk.metadata['original_filename'] = file.filename
-                        chunk.metadata['ingestion_timestamp_utc'] = datetime.now().isoformat()
-                    
-                    logger.info(f"File '{file.filename}' devided for {len(chunks)} chunks with metadata.")
+                    logger.info("File '{}' devided for {} chunks with metadata.", file.filename, len(chunks))
                     return chunks
                 
                 chunks = await run_in_threadpool(process_file_sync)
-                all_chunks.extend(chunks)
-                processed_filenames.append(file.filename)
+                return file.filename, chunks
 
             except Exception as e:
                 logger.error(f"Error during file processing {file.filename}: {e}")
-                error_files.append(file.filename)
+                return file.filename, None
             
             finally:
-                if 'tmp_path' in locals() and os.path.exists(tmp_path):
-                    os.remove(tmp_path)
                 await file.close()
 
-        if not all_chunks:
-            logger.warning("No fragments found to add to the vector database.")
-            return 0, error_files
-        
+    async def _iter_file_chunks(
+        self, files: List[UploadFile], ingestion_timestamp: str
+    ) -> AsyncIterator[tuple[str, List[Document] | None]]:
+        """Processes all files concurrently and yields each file's chunks as soon as it is split."""
+        semaphore = asyncio.Semaphore(settings.MAX_FILES_COUNT)
+        tasks = [
+            asyncio.create_task(self._process_single_file(file, semaphore, ingestion_timestamp))
+            for file in files
+        ]
         try:
-            logger.info(f"Adding {len(all_chunks)} chunks to the vector database ...")
-            batch_size = 10
-            total_added = 0
-            for i in range(0, len(all_chunks), batch_size):
-                batch = all_chunks[i:i + batch_size]
-                logger.info(f"Adding batch {i//batch_size + 1}/{(len(all_chunks) + batch_size - 1)//batch_size} ({len(batch)} chunks)...")
-                await run_in_threadpool(self.vector_store.add_documents, documents=batch)
-                total_added += len(batch)
-            logger.success(f"Added {len(all_chunks)} chunks.")
-
-            if processed_filenames:
-                await self._update_document_index(processed_filenames)
-
-            return len(all_chunks), error_files
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _embed_texts(self, texts: List[str]) -> List[List[float]]:
+        """Embeds texts in even, length-sorted, rate-limited sub-batches, or in one call to a local model."""
+        if not texts:
+            return []
+
+        if settings.EMBEDDING_BACKEND == "local":
+            return await run_in_threadpool(self.embeddings_model.embed_documents, texts)
+
+        batch_count = math.ceil(len(texts) / settings.EMBEDDING_BATCH_SIZE)
+        batch_size = math.ceil(len(texts) / batch_count)
+        semaphore = asyncio.Semaphore(settings.EMBEDDING_MAX_CONCURRENT_REQUESTS)
+
+        # Batching texts of similar length keeps the endpoint from padding short chunks to the longest one.
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        sorted_texts = [texts[i] for i in order]
+
+        async def embed_batch(batch: List[str]) -> List[List[float]]:
+            async with semaphore:
+                return await self.embeddings_model.aembed_documents(batch)
+
+        results = await asyncio.gather(
+            *[embed_batch(sorted_texts[i:i + batch_size]) for i in range(0, len(texts), batch_size)]
+        )
+
+        vectors: List[List[float]] = [None] * len(texts)
+        for i, vector in zip(order, (vector for batch in results for vector in batch)):
+            vectors[i] = vector
+        return vectors
+
+    async def _store_chunks(self, chunks: List[Document]):
+        """
+        Embeds one batch of chunks and adds it to the collection. Each chunk's metadata also
+        gets the source snippet the query service returns, so it isn't sliced on every query.
+        """
+        texts = [chunk.page_content for chunk in chunks]
+        metadatas = [
+            {**chunk.metadata, "snippet": f"{text[:settings.SNIPPET_LENGTH]}..."}
+            for chunk, text in zip(chunks, texts)
+        ]
+        # float32 is what Chroma stores; converting once avoids a per-row conversion in the client.
+        embeddings = np.asarray(await self._embed_texts(texts), dtype=np.float32)
+        async with self.write_semaphore:
+            await self.collection.add(
+                ids=[uuid4().hex for _ in chunks],
+                embeddings=embeddings,
+                documents=texts,
+                metadatas=metadatas
+            )
+
+    async def process_and_store_files(self, files: List[UploadFile]) -> tuple[int, List[str]]:
+        """
+        Splits the files and stores their chunks in batches of VECTOR_STORE_BATCH_SIZE as soon as
+        enough chunks are ready, so only the pending batch is held in memory.
+        """
+        error_files = []
+        processed_filenames = []
+        pending: List[Document] = []
+        total_added = 0
+        batch_size = settings.VECTOR_STORE_BATCH_SIZE
+        ingestion_timestamp = datetime.now(timezone.utc).isoformat()
+
+        try:
+            async with aclosing(self._iter_file_chunks(files, ingestion_timestamp)) as file_chunks:
+                async for filename, chunks in file_chunks:
+                    if chunks is None:
+                        error_files.append(filename)
+                        continue
+                    if chunks:
+                        processed_filenames.append(filename)
+
+                    pending.extend(chunks)
+                    while len(pending) >= batch_size:
+                        logger.debug("Adding batch of {} chunks...", batch_size)
+                        await self._store_chunks(pending[:batch_size])
+                        del pending[:batch_size]
+                        total_added += batch_size
+
+            # Files finish in any order; report the failed ones in upload order.
+            upload_order = {file.filename: i for i, file in enumerate(files)}
+            error_files.sort(key=upload_order.get)
+
+            if pending:
+                logger.debug("Adding batch of {} chunks...", len(pending))
+                await self._store_chunks(pending)
+                total_added += len(pending)
+
+            if not total_added:
+                logger.warning("No fragments found to add to the vector database.")
+                return 0, error_files
+
+            logger.success(f"Added {total_added} chunks.")
+
+            await run_in_threadpool(self.filename_index.add, processed_filenames)
+            logger.success(f"Index updated. Added {len(processed_filenames)} names.")
+
+            return total_added, error_files
         
         except Exception as e:
             logger.error(f"Failed to add documents to ChromaDB: {e}")
             raise HTTPException(status_code=500, detail=f"Error writing to the vector database: {e}")
-        
+
     async def delete_document_by_name(self, filename: str):
         logger.info(f"Deletion request for document received: {filename}")
+        where = {"original_filename": filename}
+
+        try:
+            exists = bool((await self.collection.get(where=where, limit=1, include=[]))["ids"])
 
-        current_filenames = await self.get_all_document_names()
-        if filename not in current_filenames:
-            logger.warning(f"Document '{filename}' not found in the index. No deletion performed.")
+        except Exception as e:
+            logger.error(f"Failed to look up document chunks in ChromaDB for '{filename}': {e}")
+            raise HTTPException(status_code=500, detail=f"Error reading from the vector store: {e}")
+
+        if not exists:
+            # Drop a stale index entry, if any, so the listing matches the vector store.
+            await run_in_threadpool(self.filename_index.remove, filename)
+            logger.warning(f"Document '{filename}' not found in the vector store. No deletion performed.")
             raise HTTPException(status_code=404, detail=f"Document '{filename}' not found.")
 
         try:
-            def delete_chunks_sync():
-                self.vector_store.delete(where={"original_filename": filename})
-                logger.success(f"Successfully deleted all chunks for document: {filename}")
-            
-            await run_in_threadpool(delete_chunks_sync)
+            await self.collection.delete(where=where)
+            logger.success(f"Successfully deleted all chunks for document: {filename}")
 
         except Exception as e:
             logger.error(f"Failed to delete document chunks from ChromaDB for '{filename}': {e}")
             raise HTTPException(status_code=500, detail=f"Error deleting chunks from vector store: {e}")
 
-        # Krok 3: Zaktualizuj dokument indeksu, aby usunąć nazwę pliku
-        async with self.index_update_lock:
-            logger.info(f"Lock acquired. Updating index to remove '{filename}'.")
-            updated_list = await self.get_all_document_names()
-            if filename in updated_list:
-                updated_list.remove(filename)
-
-                def upsert_index_sync():
-                    serialized_filenames = "|".join(updated_list)
-                    index_doc = Document(
-                        page_content="This is an index document. Do not delete.",
-                        metadata={"filenames": serialized_filenames}
-                    )
-
-                    self.vector_store.add_documents(documents=[index_doc], ids=[self.DOCUMENT_INDEX_ID])
-                    logger.success(f"Index updated successfully. Removed '{filename}'.")
-
-                await run_in_threadpool(upsert_index_sync)
-            else:
-                logger.warning(f"'{filename}' was already removed from the index, possibly by a concurrent process.")
\ No newline at end of file
+        await run_in_threadpool(self.filename_index.remove, filename)
+        logger.success(f"Index updated successfully. Removed '{filename}'.")
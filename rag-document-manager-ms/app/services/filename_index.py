@@ -0,0 +1,112 @@
+import bisect
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Callable, Iterable, Iterator, List
+
+
+class FilenameIndex:
+    """Keeps the sorted names of the ingested documents in a WAL-mode SQLite database, cached in memory."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._cache_lock = threading.Lock()
+        # Paired with the generation it was read at; every write, from any process, bumps the generation.
+        self._cached_names: tuple[int, List[str]] | None = None
+        with self._transaction() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS filenames (name TEXT PRIMARY KEY, added_at TEXT NOT NULL)"
+            )
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS index_state (id INTEGER PRIMARY KEY CHECK (id = 0), generation INTEGER NOT NULL)"
+            )
+            connection.execute("INSERT OR IGNORE INTO index_state (id, generation) VALUES (0, 0)")
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            self._local.connection = connection
+        return connection
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield connection
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+
+    @staticmethod
+    def _generation(connection: sqlite3.Connection) -> int:
+        return connection.execute("SELECT generation FROM index_state WHERE id = 0").fetchone()[0]
+
+    @staticmethod
+    def _bump_generation(connection: sqlite3.Connection) -> int:
+        """Bumps the generation inside the current write transaction and returns the previous one."""
+        connection.execute("UPDATE index_state SET generation = generation + 1 WHERE id = 0")
+        return FilenameIndex._generation(connection) - 1
+
+    def _patch_cache(self, previous_generation: int, update: Callable[[List[str]], None]):
+        """Applies a committed write to the cached list, if the cache was current before that write."""
+        with self._cache_lock:
+            if self._cached_names is None or self._cached_names[0] != previous_generation:
+                self._cached_names = None
+                return
+            names = list(self._cached_names[1])
+            update(names)
+            self._cached_names = (previous_generation + 1, names)
+
+    def is_empty(self) -> bool:
+        return self._connection().execute("SELECT 1 FROM filenames LIMIT 1").fetchone() is None
+
+    def names(self) -> List[str]:
+        connection = self._connection()
+        generation = self._generation(connection)
+        with self._cache_lock:
+            cached = self._cached_names
+        if cached is not None and cached[0] == generation:
+            return list(cached[1])
+
+        # Read after the generation: a concurrent write at worst makes the next call refetch.
+        rows = connection.execute("SELECT name FROM filenames ORDER BY name").fetchall()
+        names = [name for (name,) in rows]
+        with self._cache_lock:
+            self._cached_names = (generation, names)
+        return list(names)
+
+    def add(self, names: Iterable[str]):
+        names = set(names)
+        added_at = datetime.now(timezone.utc).isoformat()
+        with self._transaction() as connection:
+            connection.executemany(
+                "INSERT OR IGNORE INTO filenames (name, added_at) VALUES (?, ?)",
+                [(name, added_at) for name in names]
+            )
+            previous_generation = self._bump_generation(connection)
+
+        def insert(cached: List[str]):
+            for name in names:
+                i = bisect.bisect_left(cached, name)
+                if i == len(cached) or cached[i] != name:
+                    cached.insert(i, name)
+
+        self._patch_cache(previous_generation, insert)
+
+    def remove(self, name: str):
+        with self._transaction() as connection:
+            connection.execute("DELETE FROM filenames WHERE name = ?", (name,))
+            previous_generation = self._bump_generation(connection)
+
+        def delete(cached: List[str]):
+            i = bisect.bisect_left(cached, name)
+            if i < len(cached) and cached[i] == name:
+                del cached[i]
+
+        self._patch_cache(previous_generation, delete)
@@ -3,6 +3,8 @@
 from fastapi import HTTPException
 import pytest_asyncio
 from app.main import app 
+from app.core.dependencies.service_dep import get_document_service
+from app.services.document_service import DocumentService
 from httpx import ASGITransport, AsyncClient
 import pytest
 
@@ -13,18 +15,23 @@ pytestmark = pytest.mark.asyncio
 def anyio_backend():
     return 'asyncio'
 
+@pytest.fixture
+def document_service(mocker):
+    service = mocker.AsyncMock(spec=DocumentService)
+    app.dependency_overrides[get_document_service] = lambda: service
+    yield service
+    app.dependency_overrides.clear()
+
 @pytest_asyncio.fixture
-async def client():
+async def client(document_service):
     async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test/api/v1") as ac:
         yield ac
 
-async def test_list_documents_success(client: AsyncClient, mocker):
+async def test_list_documents_success(client: AsyncClient, document_service):
     expected_docs = ["doc1.pdf", "raport.docx"]
 
-    mock_get_docs = mocker.patch(
-        "app.api.endpoints.documents.rag_processor.get_all_document_names",
-        return_value=expected_docs
-    )
+    mock_get_docs = document_service.get_all_document_names
+    mock_get_docs.return_value = expected_docs
 
     response = await client.get("/documents")
 
@@ -36,11 +43,8 @@ async def test_list_documents_success(client: AsyncClient, mocker):
 
     mock_get_docs.assert_awaited_once()
 
-async def test_list_documents_empty(client: AsyncClient, mocker):
-    mocker.patch(
-        "app.api.endpoints.documents.rag_processor.get_all_document_names",
-        return_value=[]
-    )
+async def test_list_documents_empty(client: AsyncClient, document_service):
+    document_service.get_all_document_names.return_value = []
 
     response = await client.get("/documents")
 
@@ -50,11 +54,11 @@ async def test_list_documents_empty(client: AsyncClient, mocker):
         "documents": []
     }
 
-async def test_delete_document_success(client: AsyncClient, mocker):
+async def test_delete_document_success(client: AsyncClient, document_service):
 
     filename = "File_to_delete.pdf"
 
-    mock_delete = mocker.patch("app.api.endpoints.documents.rag_processor.delete_document_by_name")
+    mock_delete = document_service.delete_document_by_name
 
     response = await client.delete(f"/documents/{filename}")
 
@@ -65,24 +69,19 @@ async def test_delete_document_success(client: AsyncClient, mocker):
     }
     mock_delete.assert_awaited_once_with(filename)
 
-async def test_delete_document_not_found(client: AsyncClient, mocker):
+async def test_delete_document_not_found(client: AsyncClient, document_service):
     filename = "Non_Existing.txt"
     
-    mocker.patch(
-        "app.api.endpoints.documents.rag_processor.delete_document_by_name",
-        side_effect=HTTPException(status_code=404, detail=f"Document '{filename}' not found.")
-    )
+    document_service.delete_document_by_name.side_effect = HTTPException(status_code=404, detail=f"Document '{filename}' not found.")
 
     response = await client.delete(f"/documents/{filename}")
 
     assert response.status_code == 404
     assert response.json() == {"detail": f"Document '{filename}' not found."}
 
-async def test_ingest_documents_success(client: AsyncClient, mocker):
-    mock_process = mocker.patch(
-        "app.api.endpoints.documents.rag_processor.process_and_store_files",
-        return_value=(150, [])
-    )
+async def test_ingest_documents_success(client: AsyncClient, document_service):
+    mock_process = document_service.process_and_store_files
+    mock_process.return_value = (150, [])
 
     files_to_upload = [
         ('files', ('test1.pdf', b'fake pdf content', 'application/pdf')),
@@ -98,4 +97,24 @@ async def test_ingest_documents_success(client: AsyncClient, mocker):
         "files_with_errors": [],
         "message": "Ingestion process completed. Processed 2 files successfully."
     }
-    assert mock_process.await_count == 1
\ No newline at end of file
+    assert mock_process.await_count == 1
+
+async def test_ingest_rejects_oversized_request_before_reading_body(client: AsyncClient, document_service):
+    response = await client.post(
+        "/ingest-to-rag",
+        content=b"ignored",
+        headers={"content-type": "multipart/form-data; boundary=x", "content-length": str(1024 ** 3)}
+    )
+
+    assert response.status_code == 413
+    document_service.process_and_store_files.assert_not_awaited()
+
+async def test_unexpected_error_returns_generic_500(document_service):
+    document_service.get_all_document_names.side_effect = RuntimeError("boom")
+
+    transport = ASGITransport(app=app, raise_app_exceptions=False)
+    async with AsyncClient(transport=transport, base_url="http://test/api/v1") as ac:
+        response = await ac.get("/documents")
+
+    assert response.status_code == 500
+    assert response.json() == {"detail": "An unexpected internal error occurred."}
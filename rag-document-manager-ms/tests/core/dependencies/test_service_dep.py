@@ -0,0 +1,65 @@
+from unittest.mock import AsyncMock
+
+import pytest
+
+from app.core.config import settings
+from app.core.dependencies import service_dep
+
+
+@pytest.fixture
+def chroma_client():
+    client = AsyncMock()
+    client.get_or_create_collection.return_value = "collection"
+    return client
+
+@pytest.fixture
+def sleep(mocker):
+    mocker.patch.object(settings, "CHROMA_CONNECT_ATTEMPTS", 3)
+    mocker.patch.object(settings, "CHROMA_CONNECT_BACKOFF_SECONDS", 0.5)
+    return mocker.patch("app.core.dependencies.service_dep.asyncio.sleep", new=AsyncMock())
+
+@pytest.mark.asyncio
+async def test_create_chroma_collection_retries_with_backoff(mocker, chroma_client, sleep):
+    connect = mocker.patch(
+        "app.core.dependencies.service_dep.chromadb.AsyncHttpClient",
+        new=AsyncMock(side_effect=[ConnectionError("refused"), ConnectionError("refused"), chroma_client])
+    )
+
+    collection = await service_dep.create_chroma_collection()
+
+    assert collection == "collection"
+    assert connect.await_count == 3
+    assert [call.args[0] for call in sleep.await_args_list] == [0.5, 1.0]
+
+@pytest.mark.asyncio
+async def test_create_chroma_collection_raises_after_the_last_attempt(mocker, chroma_client, sleep):
+    chroma_client.heartbeat.side_effect = ConnectionError("refused")
+    mocker.patch("app.core.dependencies.service_dep.chromadb.AsyncHttpClient", new=AsyncMock(return_value=chroma_client))
+
+    with pytest.raises(ConnectionError):
+        await service_dep.create_chroma_collection()
+
+    assert chroma_client.heartbeat.await_count == 3
+    assert sleep.await_count == 2
+    chroma_client.get_or_create_collection.assert_not_awaited()
+
+@pytest.fixture
+def token_splitter_settings(mocker):
+    tokenizer = mocker.Mock()
+    # Two special tokens, like the e5 models' <s> and </s>.
+    tokenizer.encode.side_effect = lambda text, add_special_tokens=True: text.split() + ["<s>", "</s>"] * add_special_tokens
+    mocker.patch("app.core.dependencies.service_dep.get_tokenizer", return_value=tokenizer)
+    mocker.patch.object(settings, "TEXT_SPLITTER_LENGTH_UNIT", "tokens")
+    mocker.patch.object(settings, "EMBEDDING_MAX_TOKENS", 512)
+    service_dep.get_text_splitter.cache_clear()
+    yield
+    service_dep.get_text_splitter.cache_clear()
+
+@pytest.mark.parametrize(("configured", "expected"), [(1500, 510), (510, 510), (300, 300)])
+def test_token_chunk_size_is_capped_to_the_model_input(mocker, token_splitter_settings, configured, expected):
+    mocker.patch.object(settings, "TEXT_SPLITTER_CHUNK_SIZE", configured)
+
+    splitter = service_dep.get_text_splitter()
+
+    assert splitter._chunk_size == expected
+    assert splitter._length_function("one two three") == 3
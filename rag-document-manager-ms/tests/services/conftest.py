@@ -0,0 +1,20 @@
+from langchain_core.embeddings import Embeddings
+import pytest
+
+
+class RecordingEmbeddings(Embeddings):
+    """Deterministic embeddings that remember every batch they were asked to embed."""
+
+    def __init__(self):
+        self.calls = []
+
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        return [[float(len(text)), 1.0] for text in texts]
+
+    def embed_query(self, text):
+        return [float(len(text)), 1.0]
+
+@pytest.fixture
+def recording_embeddings():
+    return RecordingEmbeddings()
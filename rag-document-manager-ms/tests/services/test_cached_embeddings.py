@@ -0,0 +1,46 @@
+import pytest
+
+from app.services.cached_embeddings import CachedEmbeddings
+
+
+def test_embed_documents_only_embeds_cache_misses(recording_embeddings):
+    inner = recording_embeddings
+    cached = CachedEmbeddings(inner, capacity=10)
+
+    first = cached.embed_documents(["alpha", "beta"])
+    second = cached.embed_documents(["beta", "gamma", "alpha"])
+
+    assert first == [[5.0, 1.0], [4.0, 1.0]]
+    assert second == [[4.0, 1.0], [5.0, 1.0], [5.0, 1.0]]
+    assert inner.calls == [["alpha", "beta"], ["gamma"]]
+
+def test_least_recently_used_entry_is_evicted(recording_embeddings):
+    inner = recording_embeddings
+    cached = CachedEmbeddings(inner, capacity=2)
+
+    cached.embed_documents(["alpha", "beta"])
+    cached.embed_documents(["alpha"])
+    cached.embed_documents(["gamma"])
+    cached.embed_documents(["alpha", "beta"])
+
+    assert inner.calls[-1] == ["beta"]
+
+@pytest.mark.asyncio
+async def test_aembed_documents_shares_the_cache(recording_embeddings):
+    inner = recording_embeddings
+    cached = CachedEmbeddings(inner, capacity=10)
+
+    cached.embed_documents(["alpha"])
+    vectors = await cached.aembed_documents(["alpha", "beta"])
+
+    assert vectors == [[5.0, 1.0], [4.0, 1.0]]
+    assert inner.calls == [["alpha"], ["beta"]]
+
+def test_repeated_texts_in_one_call_are_embedded_once(recording_embeddings):
+    inner = recording_embeddings
+    cached = CachedEmbeddings(inner, capacity=10)
+
+    vectors = cached.embed_documents(["footer", "alpha", "footer"])
+
+    assert vectors == [[6.0, 1.0], [5.0, 1.0], [6.0, 1.0]]
+    assert inner.calls == [["footer", "alpha"]]
@@ -0,0 +1,103 @@
+import asyncio
+import io
+import threading
+
+from fastapi import UploadFile
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+import pytest
+
+from app.services.document_service import DocumentService
+from app.services.filename_index import FilenameIndex
+
+pytestmark = pytest.mark.asyncio
+
+
+@pytest.fixture
+def collection(mocker):
+    return mocker.AsyncMock()
+
+@pytest.fixture
+def service(collection, recording_embeddings, tmp_path, mocker):
+    mocker.patch("app.services.document_service.settings.VECTOR_STORE_BATCH_SIZE", 3)
+    return DocumentService(
+        collection=collection,
+        text_splitter=RecursiveCharacterTextSplitter(chunk_size=10, chunk_overlap=0),
+        embeddings_model=recording_embeddings,
+        filename_index=FilenameIndex(str(tmp_path / "index.db")),
+        write_semaphore=asyncio.Semaphore(1)
+    )
+
+def upload(filename: str, content: bytes) -> UploadFile:
+    return UploadFile(file=io.BytesIO(content), filename=filename)
+
+async def test_process_and_store_files_adds_chunks_in_batches(service, collection):
+    files = [
+        upload("a.txt", b"one two three four five six seven"),
+        upload("b.txt", b"eight nine ten"),
+        upload("broken.xyz", b"unsupported"),
+    ]
+
+    total_added, error_files = await service.process_and_store_files(files)
+
+    added = [call.kwargs for call in collection.add.call_args_list]
+    assert total_added == sum(len(batch["ids"]) for batch in added)
+    assert all(len(batch["ids"]) <= 3 for batch in added)
+    assert all(batch["embeddings"].dtype.name == "float32" for batch in added)
+    assert {m["original_filename"] for batch in added for m in batch["metadatas"]} == {"a.txt", "b.txt"}
+    assert all(
+        m["snippet"] == f"{text[:200]}..."
+        for batch in added for m, text in zip(batch["metadatas"], batch["documents"])
+    )
+    assert error_files == ["broken.xyz"]
+    assert await service.get_all_document_names() == ["a.txt", "b.txt"]
+
+async def test_files_with_errors_keep_the_upload_order(service, mocker):
+    second_failed = threading.Event()
+
+    def load_document(filename, stream):
+        if filename == "first.xyz":
+            second_failed.wait(timeout=5)
+        else:
+            second_failed.set()
+        raise ValueError(f"Unsupported file: {filename}")
+
+    mocker.patch("app.services.document_service.load_document", side_effect=load_document)
+
+    _, error_files = await service.process_and_store_files([upload("first.xyz", b"x"), upload("second.xyz", b"y")])
+
+    assert error_files == ["first.xyz", "second.xyz"]
+
+async def test_embed_texts_spreads_texts_evenly_over_requests(service, recording_embeddings, mocker):
+    mocker.patch("app.services.document_service.settings.EMBEDDING_BATCH_SIZE", 64)
+    texts = [f"text {i}" for i in range(200)]
+
+    vectors = await service._embed_texts(texts)
+
+    assert [len(call) for call in recording_embeddings.calls] == [50, 50, 50, 50]
+    assert vectors == [[float(len(text)), 1.0] for text in texts]
+
+async def test_delete_document_by_name_removes_chunks_and_index_entry(service, collection):
+    service.filename_index.add(["a.txt"])
+    collection.get.return_value = {"ids": ["chunk-1"]}
+
+    await service.delete_document_by_name("a.txt")
+
+    collection.delete.assert_awaited_once_with(where={"original_filename": "a.txt"})
+    assert await service.get_all_document_names() == []
+
+async def test_embed_texts_sends_everything_at_once_to_a_local_model(service, recording_embeddings, mocker):
+    mocker.patch("app.services.document_service.settings.EMBEDDING_BACKEND", "local")
+    texts = [f"text {i}" for i in range(200)]
+
+    await service._embed_texts(texts)
+
+    assert recording_embeddings.calls == [texts]
+
+async def test_embed_texts_batches_similar_lengths_and_keeps_input_order(service, recording_embeddings, mocker):
+    mocker.patch("app.services.document_service.settings.EMBEDDING_BATCH_SIZE", 2)
+    texts = ["a" * 9, "a", "a" * 5, "a" * 2]
+
+    vectors = await service._embed_texts(texts)
+
+    assert sorted(recording_embeddings.calls) == [["a", "a" * 2], ["a" * 5, "a" * 9]]
+    assert vectors == [[9.0, 1.0], [1.0, 1.0], [5.0, 1.0], [2.0, 1.0]]
@@ -0,0 +1,66 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from app.services.filename_index import FilenameIndex
+
+
+def test_add_ignores_duplicates_and_names_are_sorted(tmp_path):
+    index = FilenameIndex(str(tmp_path / "index.db"))
+
+    index.add(["raport.docx", "doc1.pdf"])
+    index.add(["doc1.pdf"])
+
+    assert index.names() == ["doc1.pdf", "raport.docx"]
+
+def test_remove_and_is_empty(tmp_path):
+    index = FilenameIndex(str(tmp_path / "index.db"))
+    assert index.is_empty()
+
+    index.add(["doc1.pdf"])
+    assert not index.is_empty()
+
+    index.remove("doc1.pdf")
+    index.remove("missing.txt")
+    assert index.is_empty()
+
+def test_index_is_persisted_between_instances(tmp_path):
+    path = str(tmp_path / "index.db")
+    FilenameIndex(path).add(["doc1.pdf"])
+
+    assert FilenameIndex(path).names() == ["doc1.pdf"]
+
+def test_concurrent_writers_from_threads(tmp_path):
+    index = FilenameIndex(str(tmp_path / "index.db"))
+    names = [f"doc{i}.pdf" for i in range(20)]
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda name: index.add([name]), names))
+
+    assert index.names() == sorted(names)
+
+def test_names_see_writes_from_another_instance(tmp_path):
+    path = str(tmp_path / "index.db")
+    reader, writer = FilenameIndex(path), FilenameIndex(path)
+
+    assert reader.names() == []
+    writer.add(["doc1.pdf"])
+    assert reader.names() == ["doc1.pdf"]
+    writer.remove("doc1.pdf")
+    assert reader.names() == []
+
+def test_cached_names_follow_own_and_foreign_writes(tmp_path):
+    path = str(tmp_path / "index.db")
+    index, other = FilenameIndex(path), FilenameIndex(path)
+    index.add(["b.pdf"])
+    assert index.names() == ["b.pdf"]
+
+    index.add(["a.pdf", "c.pdf", "b.pdf"])
+    index.remove("b.pdf")
+    assert index.names() == ["a.pdf", "c.pdf"]
+
+    # The foreign write makes the cached list stale, so the own write after it must not patch that list.
+    other.add(["d.pdf"])
+    index.add(["e.pdf"])
+    assert index.names() == ["a.pdf", "c.pdf", "d.pdf", "e.pdf"]
+
+    other.remove("a.pdf")
+    assert index.names() == ["c.pdf", "d.pdf", "e.pdf"]
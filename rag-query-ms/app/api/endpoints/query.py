@@ -1,5 +1,8 @@
     
+import json
+
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import StreamingResponse
 from loguru import logger
 
 from app.api.endpoints import schemas
@@ -26,4 +29,45 @@ async def ask_question(request: schemas.QueryRequest, ragService: RAGService = D
     return schemas.QueryResponse(
         answer=response_dict.get("answer", "No answer could be generated."),
         sources=response_dict.get("sources", [])
-    )
\ No newline at end of file
+    )
+
+@router.post(
+    "/query/batch",
+    response_model=schemas.BatchQueryResponse,
+    summary="Ask several questions to the RAG pipeline at once",
+    description="Answers each question like /query, sharing one embedding request and one vector search across the batch. Results are returned in the order of the questions; a question that failed carries an error instead of failing the batch."
+)
+async def ask_questions(request: schemas.BatchQueryRequest, ragService: RAGService = Depends(get_rag_service)):
+    response_dicts = await ragService.get_rag_responses(request.questions)
+    failed = sum("error" in response for response in response_dicts)
+    if failed == len(response_dicts):
+        logger.error(f"RAG service returned an error for all {failed} batched questions.")
+        raise HTTPException(
+            status_code=500,
+            detail="An internal error occurred while processing the query."
+        )
+    if failed:
+        logger.warning(f"RAG service returned an error for {failed} of {len(response_dicts)} batched questions.")
+
+    return schemas.BatchQueryResponse(
+        results=[
+            schemas.BatchQueryResult(
+                answer=response.get("answer", "No answer could be generated."),
+                sources=response.get("sources", []),
+                error=response.get("error")
+            )
+            for response in response_dicts
+        ]
+    )
+
+@router.post(
+    "/query/stream",
+    summary="Ask a question and stream the answer",
+    description="Streams the answer as Server-Sent Events: token deltas, an optional fallback marker when the answer is not grounded in the documents, the sources, and a final done event."
+)
+async def ask_question_stream(request: schemas.QueryRequest, ragService: RAGService = Depends(get_rag_service)):
+    async def event_stream():
+        async for event in ragService.stream_rag_response(request.question):
+            yield f"event: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
\ No newline at end of file
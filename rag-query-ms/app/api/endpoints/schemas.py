@@ -1,19 +1,47 @@
-from pydantic import BaseModel, Field, validator
+from typing import Annotated
+from pydantic import BaseModel, ConfigDict, Field, field_validator
+
+from app.core.config import settings
 
 class QueryRequest(BaseModel):
     question: str = Field(..., min_length=1, max_length=1000)
     conversation_id: str | None = None
     
-    @validator('question')
+    @field_validator('question')
+    @classmethod
     def validate_question(cls, v):
         if not v.strip():
             raise ValueError('Question cannot be empty')
         return v.strip()
 
+class BatchQueryRequest(BaseModel):
+    questions: list[Annotated[str, Field(min_length=1, max_length=1000)]] = Field(
+        ..., min_length=1, max_length=settings.BATCH_MAX_QUESTIONS
+    )
+
+    @field_validator('questions')
+    @classmethod
+    def validate_questions(cls, v):
+        if any(not question.strip() for question in v):
+            raise ValueError('Questions cannot be empty')
+        return [question.strip() for question in v]
+
 class SourceDocument(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     filename: str
     page_content_snippet: str
 
 class QueryResponse(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     answer: str
-    sources: list[SourceDocument]
\ No newline at end of file
+    sources: list[SourceDocument]
+
+class BatchQueryResult(QueryResponse):
+    error: str | None = None
+
+class BatchQueryResponse(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
+    results: list[BatchQueryResult]
\ No newline at end of file
@@ -1,3 +1,4 @@
+from typing import Literal
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
@@ -8,15 +9,36 @@ class Settings(BaseSettings):
 
     CHROMA_HOST: str = "localhost"
     CHROMA_PORT: int = 8000
+    CHROMA_HTTP_MAX_CONNECTIONS: int = 32
+    CHROMA_CONNECT_ATTEMPTS: int = 5
+    CHROMA_CONNECT_BACKOFF_SECONDS: float = 1.0
     RAG_COLLECTION_NAME: str = "rag_collection"
     HUGGINGFACEHUB_API_TOKEN: str
     HF_EMBEDDING_MODEL: str = "intfloat/multilingual-e5-large"
+    EMBEDDING_BACKEND: Literal["endpoint", "local"] = "endpoint"
+    EMBEDDING_LOCAL_RUNTIME: Literal["torch", "onnx"] = "torch"
+    EMBEDDING_LOCAL_DEVICE: str = "cpu"
+    # A prebuilt export in the model repository, e.g. "onnx/model_qint8_avx512_vnni.onnx" for the int8 one.
+    EMBEDDING_LOCAL_ONNX_FILE: str | None = None
     LLM_MODEL_NAME: str = "gemini-2.5-flash"
 
     RAG_K_DOCUMENTS: int = 5
     LLM_TEMPERATURE: float = 0.2
     SNIPPET_LENGTH: int = 200
     REQUEST_TIMEOUT: int = 30
+    BATCH_MAX_QUESTIONS: int = 20
+    BATCH_MAX_CONCURRENT_QUERIES: int = 8
+    SPECULATIVE_REWRITE: bool = False
+    MAX_CONCURRENT_LLM_CALLS: int = 16
+
+    EXACT_CACHE_MAX_ENTRIES: int = 1024
+    EXACT_CACHE_TTL_SECONDS: int = 600
+    # Off by default: e5 similarities cluster near 1, so questions that differ only by an entity or a year
+    # ("revenue in 2022" vs "revenue in 2023") can clear the threshold and get each other's answer and sources.
+    SEMANTIC_CACHE_ENABLED: bool = False
+    SEMANTIC_CACHE_THRESHOLD: float = 0.95
+    SEMANTIC_CACHE_MAX_ENTRIES: int = 1024
+    SEMANTIC_CACHE_TTL_SECONDS: int = 600
 
     GOOGLE_API_KEY: str
 
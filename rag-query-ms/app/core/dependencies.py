@@ -1,56 +1,80 @@
+import asyncio
 from functools import lru_cache
-from http.client import HTTPException
-from langchain_huggingface import HuggingFaceEndpointEmbeddings
+import time
+from langchain_huggingface import HuggingFaceEmbeddings, HuggingFaceEndpointEmbeddings
 from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_chroma import Chroma
-from langchain_core.vectorstores import VectorStoreRetriever
 import chromadb
+from chromadb.api.models.AsyncCollection import AsyncCollection
+from chromadb.config import Settings as ChromaSettings
 from langchain_core.language_models import BaseChatModel
 from langchain_core.embeddings import Embeddings
-from fastapi import Depends
+from fastapi import Depends, Request
 from loguru import logger
 
 from app.core.config import settings
 from app.services.rag_service import RAGService
+from app.services.semantic_cache import SemanticCache
 
 @lru_cache(maxsize=None)
 def get_settings():
     return settings
 
+def _create_local_embeddings() -> Embeddings:
+    """Loads the local model, from the ONNX export named by EMBEDDING_LOCAL_ONNX_FILE if one is set."""
+    model_kwargs = {
+        "device": get_settings().EMBEDDING_LOCAL_DEVICE,
+        "backend": get_settings().EMBEDDING_LOCAL_RUNTIME,
+        "token": get_settings().HUGGINGFACEHUB_API_TOKEN
+    }
+    if get_settings().EMBEDDING_LOCAL_ONNX_FILE:
+        model_kwargs["model_kwargs"] = {"file_name": get_settings().EMBEDDING_LOCAL_ONNX_FILE}
+    return HuggingFaceEmbeddings(
+        model_name=get_settings().HF_EMBEDDING_MODEL,
+        model_kwargs=model_kwargs,
+        encode_kwargs={"normalize_embeddings": True}
+    )
+
 @lru_cache(maxsize=None)
 def get_embeddings_model() -> Embeddings:
-    """Provides a singleton instance of the embeddings model."""
+    """Provides a singleton instance of the embeddings model, remote or local per EMBEDDING_BACKEND."""
+    if get_settings().EMBEDDING_BACKEND == "local":
+        return _create_local_embeddings()
     return HuggingFaceEndpointEmbeddings(
         model=get_settings().HF_EMBEDDING_MODEL,
         huggingfacehub_api_token=get_settings().HUGGINGFACEHUB_API_TOKEN
     )
 
-@lru_cache(maxsize=None)
-def get_chroma_client() -> chromadb.HttpClient:
-    """Provides a singleton instance of the ChromaDB client."""
-    try:
-        return chromadb.HttpClient(host=get_settings().CHROMA_HOST, port=get_settings().CHROMA_PORT)
-    
-    except Exception as e:
-        logger.error(f"Failed to connect to ChromaDB: {e}")
-        raise HTTPException(status_code=503, detail="Vector database unavailable")
+async def create_chroma_collection() -> AsyncCollection:
+    """Waits for ChromaDB over up to CHROMA_CONNECT_ATTEMPTS backed-off attempts and opens the collection."""
+    attempts = get_settings().CHROMA_CONNECT_ATTEMPTS
+    for attempt in range(1, attempts + 1):
+        try:
+            client = await chromadb.AsyncHttpClient(
+                host=get_settings().CHROMA_HOST,
+                port=get_settings().CHROMA_PORT,
+                settings=ChromaSettings(
+                    chroma_http_max_connections=get_settings().CHROMA_HTTP_MAX_CONNECTIONS,
+                    chroma_http_max_keepalive_connections=get_settings().CHROMA_HTTP_MAX_CONNECTIONS
+                )
+            )
+            await client.heartbeat()
+            break
+        except Exception as e:
+            if attempt == attempts:
+                raise
+            delay = get_settings().CHROMA_CONNECT_BACKOFF_SECONDS * 2 ** (attempt - 1)
+            logger.warning(f"ChromaDB heartbeat failed ({attempt}/{attempts}): {e}. Next attempt in {delay:g}s.")
+            await asyncio.sleep(delay)
 
-@lru_cache(maxsize=None)
-def get_vector_store() -> Chroma:
-    """Provides a singleton instance of the vector store, depending on the client and embeddings."""
-    return Chroma(
-        client=get_chroma_client(),
-        collection_name=get_settings().RAG_COLLECTION_NAME,
-        embedding_function=get_embeddings_model()
+    logger.info(f"Successfully connected to ChromaDB at {get_settings().CHROMA_HOST}:{get_settings().CHROMA_PORT}")
+    return await client.get_or_create_collection(
+        name=get_settings().RAG_COLLECTION_NAME,
+        embedding_function=None
     )
 
-def get_retriever() -> VectorStoreRetriever:
-    """
-    Provides a retriever. This function is simple, so it doesn't need caching
-    if get_vector_store is already cached. It will be called each time
-    but will receive the same cached vector store instance.
-    """
-    return get_vector_store().as_retriever(search_kwargs={"k": get_settings().RAG_K_DOCUMENTS})
+def get_chroma_collection(request: Request) -> AsyncCollection:
+    """Provides the collection opened in the application lifespan."""
+    return request.app.state.chroma_collection
 
 @lru_cache(maxsize=None)
 def get_llm() -> BaseChatModel:
@@ -61,11 +85,36 @@ def get_llm() -> BaseChatModel:
         temperature=get_settings().LLM_TEMPERATURE
     )
 
+@lru_cache(maxsize=None)
+def get_semantic_cache() -> SemanticCache | None:
+    """Provides a singleton instance of the semantic response cache, or None if it is disabled."""
+    if not get_settings().SEMANTIC_CACHE_ENABLED:
+        return None
+    return SemanticCache(
+        max_entries=get_settings().SEMANTIC_CACHE_MAX_ENTRIES,
+        ttl_seconds=get_settings().SEMANTIC_CACHE_TTL_SECONDS,
+        threshold=get_settings().SEMANTIC_CACHE_THRESHOLD
+    )
+
+async def warmup_clients():
+    """
+    Sends one throwaway embedding request and one LLM call, concurrently, so the first
+    question doesn't pay for DNS, TLS handshakes, auth setup or a local model load.
+    """
+    started = time.perf_counter()
+    await asyncio.gather(
+        get_embeddings_model().aembed_query("warmup"),
+        get_llm().ainvoke("ping")
+    )
+    logger.info(f"Embeddings and LLM clients warmed up in {time.perf_counter() - started:.2f}s.")
+
 _rag_service_instance = None
 
 def get_rag_service(
-    retriever: VectorStoreRetriever = Depends(get_retriever),
+    collection: AsyncCollection = Depends(get_chroma_collection),
+    embeddings_model: Embeddings = Depends(get_embeddings_model),
     llm: BaseChatModel = Depends(get_llm),
+    semantic_cache: SemanticCache | None = Depends(get_semantic_cache),
 ) -> RAGService:
     """
     Provides a singleton instance of the RAGService.
@@ -73,5 +122,10 @@ def get_rag_service(
     global _rag_service_instance
     if _rag_service_instance is None:
         logger.info("Creating RAGService instance for the first time...")
-        _rag_service_instance = RAGService(retriever=retriever, llm=llm)
+        _rag_service_instance = RAGService(
+            collection=collection,
+            embeddings_model=embeddings_model,
+            llm=llm,
+            semantic_cache=semantic_cache
+        )
     return _rag_service_instance
\ No newline at end of file
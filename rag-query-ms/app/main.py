@@ -1,10 +1,12 @@
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, status
+from fastapi.responses import JSONResponse
 from loguru import logger
 
 from app.api.endpoints import query
 from app.core.config import settings
+from app.core.dependencies import create_chroma_collection, warmup_clients
 from app.core.logging_config import setup_logging
 
 
@@ -12,6 +14,17 @@ from app.core.logging_config import setup_logging
 async def lifespan(app: FastAPI):
     setup_logging()
     logger.info(f"Starting up {settings.APP_NAME}...")
+
+    try:
+        app.state.chroma_collection = await create_chroma_collection()
+    except Exception as e:
+        logger.error(f"Failed to connect to ChromaDB: {e}")
+        raise
+
+    try:
+        await warmup_clients()
+    except Exception as e:
+        logger.warning(f"Client warmup failed, the first query will pay the connection cost: {e}")
     yield
 
     logger.info("Shutting down...")
@@ -22,6 +35,16 @@ app = FastAPI(
     version="1.0.0"
 )
 
+
+@app.exception_handler(Exception)
+async def unhandled_exception_handler(request: Request, exc: Exception):
+    """Keeps unexpected query failures out of the response body."""
+    logger.error(f"Unexpected error while handling {request.method} {request.url.path}: {exc}")
+    return JSONResponse(
+        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        content={"detail": "An unexpected internal error occurred."}
+    )
+
 app.include_router(query.router, prefix="/api/v1", tags=["RAG API"])
 
 @app.get("/health", tags=["Health Check"])
@@ -1,11 +1,11 @@
-
-from typing import List, TypedDict
+import asyncio
+from typing import Any, AsyncIterator, List, TypedDict
 from langchain_core.documents import Document
-from langchain_chroma import Chroma
-from langchain_core.vectorstores import VectorStoreRetriever
+from chromadb.api.models.AsyncCollection import AsyncCollection
 from langchain_core.language_models import BaseChatModel
 from loguru import logger
 from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import Runnable
 from langchain_core.output_parsers import StrOutputParser
 from pydantic import BaseModel, Field
 
@@ -14,81 +14,155 @@ from app.core.config import settings
 class RelevanceDecision(BaseModel):
     """A Pydantic model for the relevance check decision."""
     is_relevant: bool = Field(description="Set to True if the answer is fully based on the context, False otherwise.")
-class GraphState(TypedDict):
+
+class GroundedAnswer(BaseModel):
+    """A Pydantic model for an answer together with the model's own grounding judgment."""
+    answer: str = Field(description="The answer to the user's question.")
+    is_grounded: bool = Field(description="Set to True if the answer is fully based on the context, False otherwise.")
+
+GENERATE_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", "You are a helpful AI assistant. Answer the user's question based solely on the context provided below. "
+    +"If the context does not contain an answer, state that and do not try to make one up. "
+    +"Also judge your own answer: set is_grounded to true only if it is fully based on the context, "
+    +"and to false if the context is insufficient.\n\nContext:\n---\n{context}\n---"),
+    ("human", "Question: {question}")
+])
+
+# The streaming path can't stream a structured answer, so it streams plain text and judges it afterwards.
+STREAM_GENERATE_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", "You are a helpful AI assistant. Answer the user's question based solely on the context provided below. "
+    +"If the context does not contain an answer, state that and do not try to make one up.\n\nContext:\n---\n{context}\n---"),
+    ("human", "Question: {question}")
+])
+
+CHECK_RELEVANCE_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", "You are an AI judge. Your task is to evaluate whether the generated answer is fully based on the provided context. " 
+    +"Respond with a boolean value indicating relevance."),
+    ("human", "Context:\n---\n{context}\n---\n\nQuestion: {question}\n\nGenerated Answer: {generation}")
+])
+
+REWRITE_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", "You are a helpful assistant. Answer the user's question. Inform them that sufficient information was not found in the provided documents to give a precise answer, but you will attempt to answer based on your general knowledge."),
+    ("human", "Question: {question}")
+])
+
+DIRECT_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", "You are a helpful AI assistant. The user sent a short conversational message such as a greeting or thanks. "
+    +"Reply briefly and offer to answer questions about their documents."),
+    ("human", "{question}")
+])
+
+class GraphState(TypedDict, total=False):
+    """Graph state. Nodes return only the keys they change and LangGraph merges them in."""
     request_id: str
     question: str
+    question_embedding: List[float]
     generation: str
     documents: List[Document]
+    context_str: str
+    is_grounded: bool
+    used_fallback: bool
+    fallback_generation: str
 
 class RAGGraphNodes:
     """Class containing all RAG graph nodes with injected dependencies."""
-    def __init__(self, retriever: VectorStoreRetriever, llm: BaseChatModel):
-        self.retriever = retriever
+    def __init__(self, collection: AsyncCollection, llm: BaseChatModel):
+        self.collection = collection
         self.llm = llm
+        # The prompts are constants, so each chain is composed once instead of on every request.
+        self.generate_chain = GENERATE_PROMPT | llm.with_structured_output(GroundedAnswer)
+        self.rewrite_chain = REWRITE_PROMPT | llm | StrOutputParser()
+        self.stream_generate_chain = STREAM_GENERATE_PROMPT | llm | StrOutputParser()
+        self.check_relevance_chain = CHECK_RELEVANCE_PROMPT | llm.with_structured_output(RelevanceDecision)
+        self.direct_chain = DIRECT_PROMPT | llm | StrOutputParser()
+        # Shared by every LLM call of the service, so bursts queue here instead of in provider 429 retries.
+        self.llm_semaphore = asyncio.Semaphore(settings.MAX_CONCURRENT_LLM_CALLS)
+
+    async def invoke_llm(self, chain: Runnable, inputs: dict) -> Any:
+        """Invokes an LLM chain once one of the MAX_CONCURRENT_LLM_CALLS slots is free."""
+        async with self.llm_semaphore:
+            return await chain.ainvoke(inputs)
+
+    async def stream_llm(self, chain: Runnable, inputs: dict) -> AsyncIterator[str]:
+        """Streams an LLM chain, holding one of the MAX_CONCURRENT_LLM_CALLS slots until it ends."""
+        async with self.llm_semaphore:
+            async for token in chain.astream(inputs):
+                yield token
+
+    async def query_documents(self, question_embeddings: List[List[float]]) -> List[List[Document]]:
+        """Retrieves the top RAG_K_DOCUMENTS chunks for every embedding in one Chroma query."""
+        result = await self.collection.query(
+            query_embeddings=question_embeddings,
+            n_results=settings.RAG_K_DOCUMENTS,
+            include=["documents", "metadatas"]
+        )
+        return [
+            [Document(page_content=text, metadata=metadata or {}) for text, metadata in zip(texts, metadatas)]
+            for texts, metadatas in zip(result["documents"], result["metadatas"])
+        ]
 
     async def retrieve_documents(self, state: GraphState):
-        """Retrieves documents from the vector store."""
+        """
+        Retrieves documents from the vector store, reusing the question embedding computed by the
+        service. Documents already fetched for a whole batch of questions are used as they are.
+        """
         request_id = state['request_id']
-        logger.info(f"[{request_id}] Node: retrieve_documents")
-        question = state["question"]
-        documents = await self.retriever.ainvoke(question)
-        logger.info(f"Retrieved {len(documents)} documents.")
+        logger.info("[{}] Node: retrieve_documents", request_id)
+        documents = state.get("documents")
+        if documents is None:
+            (documents,) = await self.query_documents([state["question_embedding"]])
+        logger.info("[{}] Retrieved {} documents.", request_id, len(documents))
+        context_str = "\n\n".join(doc.page_content for doc in documents)
+        # The document manager stores the snippet at ingestion; chunks added before that get one here.
+        for doc in documents:
+            if "snippet" not in doc.metadata:
+                doc.metadata["snippet"] = f"{doc.page_content[:settings.SNIPPET_LENGTH]}..."
 
-        return {"documents": documents, "question": question, "request_id": request_id}
+        return {"documents": documents, "context_str": context_str}
     
     async def generate_answer(self, state: GraphState):
-        """Generates an answer based on the retrieved documents."""
-        request_id = state['request_id']
-        question = state["question"]
-        documents = state["documents"]
-        logger.info(f"[{request_id}] Node: generate_answer")
-        
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", "You are a helpful AI assistant. Answer the user's question based solely on the context provided below. "
-            +"If the context does not contain an answer, state that and do not try to make one up.\n\nContext:\n---\n{context}\n---"),
-            ("human", "Question: {question}")
-        ])
-        
-        rag_chain = prompt | self.llm | StrOutputParser()
-        
-        context_str = "\n\n".join(doc.page_content for doc in documents)
-        generation = await rag_chain.ainvoke({"context": context_str, "question": question})
-        
-        logger.info("Generated an answer.")
-        return {"documents": state["documents"], "question": state["question"], "generation": generation, "request_id": request_id}
-    
-    async def check_relevance(self, state: GraphState):
         """
-        Checks if the generated answer is relevant and grounded in the provided context.
-        This node uses structured output to ensure reliable boolean responses.
+        Generates an answer based on the retrieved documents. The same structured LLM call
+        reports whether the answer is grounded in them, so no separate judge call is needed.
+
+        With SPECULATIVE_REWRITE the fallback answer is generated concurrently and kept only if
+        the answer turns out not to be grounded, trading extra tokens for a shorter worst case.
         """
         request_id = state['request_id']
         question = state["question"]
-        documents = state["documents"]
-        generation = state["generation"]
-        logger.info(f"[{request_id}] Node: check_relevance (structured_output)")
+        logger.info("[{}] Node: generate_answer (structured_output)", request_id)
 
-        structured_llm = self.llm.with_structured_output(RelevanceDecision)
+        rewrite_task = None
+        if settings.SPECULATIVE_REWRITE:
+            rewrite_task = asyncio.create_task(self.invoke_llm(self.rewrite_chain, {"question": question}))
+        try:
+            grounded_answer = await self.invoke_llm(
+                self.generate_chain, {"context": state["context_str"], "question": question}
+            )
+        except BaseException:
+            if rewrite_task is not None:
+                rewrite_task.cancel()
+            raise
 
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", "You are an AI judge. Your task is to evaluate whether the generated answer is fully based on the provided context. " 
-            +"Respond with a boolean value indicating relevance."),
-            ("human", "Context:\n---\n{context}\n---\n\nQuestion: {question}\n\nGenerated Answer: {generation}")
-        ])
+        logger.info("[{}] Generated an answer. Grounded: {}", request_id, grounded_answer.is_grounded)
+        result = {"generation": grounded_answer.answer, "is_grounded": grounded_answer.is_grounded}
+        if rewrite_task is not None:
+            if grounded_answer.is_grounded:
+                rewrite_task.cancel()
+            else:
+                result["fallback_generation"] = await rewrite_task
+        return result
+    
+    def check_retrieval(self, state: GraphState):
+        """Routes an empty retrieval straight to the fallback answer, skipping the grounded generation."""
+        if state["documents"]:
+            return "has_documents"
+        logger.info("[{}] No documents retrieved, skipping generation.", state["request_id"])
+        return "no_documents"
 
-        checker_chain = prompt | structured_llm
-        
-        context_str = "\n\n".join(doc.page_content for doc in documents)
-        
-        decision_object = await checker_chain.ainvoke({
-            "context": context_str, 
-            "question": question, 
-            "generation": generation
-        })
-        
-        logger.info(f"[{request_id}] Relevance check decision: {decision_object.is_relevant}")
-        
-        if decision_object.is_relevant:
+    def check_relevance(self, state: GraphState):
+        """Routes on the grounding judgment returned together with the answer."""
+        if state["is_grounded"]:
             return "useful"
         else:
             return "not_useful"
@@ -97,18 +171,14 @@ class RAGGraphNodes:
         """Generates an alternative answer, informing the user about the lack of specific data."""
         request_id = state['request_id']
         question = state["question"]
-        logger.info(f"[{request_id}] Node: rewrite_answer")
-        
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", "You are a helpful assistant. Answer the user's question. Inform them that sufficient information was not found in the provided documents to give a precise answer, but you will attempt to answer based on your general knowledge."),
-            ("human", "Question: {question}")
-        ])
+        logger.info("[{}] Node: rewrite_answer", request_id)
         
-        rewrite_chain = prompt | self.llm | StrOutputParser()
-        generation = await rewrite_chain.ainvoke({"question": question})
+        generation = state.get("fallback_generation")
+        if generation is None:
+            generation = await self.invoke_llm(self.rewrite_chain, {"question": question})
         
-        return {"documents": state["documents"], "question": question, "generation": generation, "request_id": request_id}
+        return {"generation": generation, "used_fallback": True}
 
-def create_rag_graph_nodes(retriever: VectorStoreRetriever, llm: BaseChatModel) -> RAGGraphNodes:
+def create_rag_graph_nodes(collection: AsyncCollection, llm: BaseChatModel) -> RAGGraphNodes:
     """Factory function to create RAG graph nodes with dependencies."""
-    return RAGGraphNodes(retriever, llm)
\ No newline at end of file
+    return RAGGraphNodes(collection, llm)
\ No newline at end of file
@@ -1,18 +1,46 @@
-import uuid
+import asyncio
+import copy
+import hashlib
+import re
+import secrets
+from typing import AsyncIterator, List
+from cachetools import TTLCache
 from loguru import logger
 from langgraph.graph import StateGraph, END
-from langchain_core.vectorstores import VectorStoreRetriever
+from chromadb.api.models.AsyncCollection import AsyncCollection
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
 from langchain_core.language_models import BaseChatModel
 
+from app.core.config import settings
 from app.services.graph_definition import (
     GraphState,
     create_rag_graph_nodes,
 )
+from app.services.semantic_cache import SemanticCache
+
+# Greetings, thanks and goodbyes that need neither retrieval nor a context window.
+TRIVIAL_QUESTION_RE = re.compile(
+    r"^(hi|hello|hey|good (morning|afternoon|evening)|thanks|thank you|thx|bye|goodbye)"
+    r"( there| again| so much| a lot| very much)?[\s!.,?]*$"
+)
+
 class RAGService:
-    def __init__(self, retriever: VectorStoreRetriever, llm: BaseChatModel):
-        self.retriever = retriever
+    def __init__(
+        self,
+        collection: AsyncCollection,
+        embeddings_model: Embeddings,
+        llm: BaseChatModel,
+        semantic_cache: SemanticCache | None
+    ):
+        self.collection = collection
+        self.embeddings_model = embeddings_model
         self.llm = llm
-        self.graph_nodes = create_rag_graph_nodes(retriever, llm)
+        self.semantic_cache = semantic_cache
+        self.exact_cache: TTLCache[bytes, dict] = TTLCache(
+            maxsize=settings.EXACT_CACHE_MAX_ENTRIES, ttl=settings.EXACT_CACHE_TTL_SECONDS
+        )
+        self.graph_nodes = create_rag_graph_nodes(collection, llm)
         self.app_graph = self._build_rag_graph()
 
     def _build_rag_graph(self):
@@ -24,7 +52,14 @@ class RAGService:
         workflow.add_node("rewrite", self.graph_nodes.rewrite_answer)
 
         workflow.set_entry_point("retrieve")
-        workflow.add_edge("retrieve", "generate")
+        workflow.add_conditional_edges(
+            "retrieve",
+            self.graph_nodes.check_retrieval,
+            {
+                "has_documents": "generate",
+                "no_documents": "rewrite",
+            },
+        )
         workflow.add_conditional_edges(
             "generate",
             self.graph_nodes.check_relevance,
@@ -38,35 +73,238 @@ class RAGService:
         logger.info("LangGraph workflow compiled successfully.")
         return workflow.compile()
     
-    async def get_rag_response(self, question: str) -> dict:
-        """
-        Runs the RAG graph for a given question and returns the final answer along with its sources.
-        This is the sole function that should be exposed to the rest of the application.
-        """
-        request_id = str(uuid.uuid4())
-        inputs = {"question": question, "request_id": request_id}
+    @staticmethod
+    def _exact_cache_key(question: str) -> bytes:
+        return hashlib.blake2b(question.strip().casefold().encode(), digest_size=16).digest()
+
+    @staticmethod
+    def _error_response() -> dict:
+        return {
+            "answer": "Sorry, an internal error occurred. Please try again later.",
+            "sources": [],
+            "error": "An internal error prevented the request from completing."
+        }
+
+    @staticmethod
+    def _build_response(answer: str, documents: List[Document]) -> dict:
+        return {
+            "answer": answer,
+            "sources": [
+                {
+                    "filename": doc.metadata.get("original_filename", "Unknown source"),
+                    "page_content_snippet": doc.metadata["snippet"]
+                }
+                for doc in documents
+            ]
+        }
+
+    def _cache_response(self, exact_key: bytes, question_embedding: List[float], response: dict):
+        self.exact_cache[exact_key] = copy.deepcopy(response)
+        if self.semantic_cache is not None:
+            self.semantic_cache.add(question_embedding, self.exact_cache[exact_key])
+
+    async def _run_graph(
+        self,
+        request_id: str,
+        question: str,
+        exact_key: bytes,
+        question_embedding: List[float],
+        documents: List[Document] | None = None
+    ) -> dict:
+        """Runs the graph for one question whose caches missed and caches a grounded answer."""
         try:
+            inputs = {"question": question, "request_id": request_id, "question_embedding": question_embedding}
+            if documents is not None:
+                inputs["documents"] = documents
             final_state = await self.app_graph.ainvoke(inputs)
 
             answer = final_state.get("generation", "Sorry, an error occurred while processing your request.")
-            documents = final_state.get("documents", [])
-
-            response = {
-                "answer": answer,
-                "sources": [
-                    {
-                        "filename": doc.metadata.get("original_filename", "Unknown source"),
-                        "page_content_snippet": doc.page_content[:200] + "..."
-                    }
-                    for doc in documents
-                ]
-            }
+            response = self._build_response(answer, final_state.get("documents", []))
+            if not final_state.get("used_fallback"):
+                self._cache_response(exact_key, question_embedding, response)
             return response
 
         except Exception as e:
-            logger.error(f"[{request_id}] An error occurred during RAG graph execution: {e}", exc_info=True)
-            return {
-                "answer": "Sorry, an internal error occurred. Please try again later.",
-                "sources": [],
-                "error": "An internal error prevented the request from completing."
-            }
+            logger.opt(exception=True).error("[{}] An error occurred during RAG graph execution: {}", request_id, e)
+            return self._error_response()
+
+    @staticmethod
+    def _is_trivial(question: str) -> bool:
+        return TRIVIAL_QUESTION_RE.match(question.strip().casefold()) is not None
+
+    async def _direct_answer(self, request_id: str, question: str) -> dict:
+        """Answers a trivial question with one short LLM call, skipping embedding and retrieval."""
+        logger.info("[{}] Trivial question, answering directly.", request_id)
+        try:
+            answer = await self.graph_nodes.invoke_llm(self.graph_nodes.direct_chain, {"question": question})
+            return self._build_response(answer, [])
+        except Exception as e:
+            logger.opt(exception=True).error("[{}] Failed to answer the question directly: {}", request_id, e)
+            return self._error_response()
+
+    def _semantic_cache_lookup(self, request_id: str, exact_key: bytes, question_embedding: List[float]) -> dict | None:
+        if self.semantic_cache is None:
+            return None
+        cached_response = self.semantic_cache.lookup(question_embedding)
+        if cached_response is None:
+            return None
+        logger.info("[{}] Semantic cache hit.", request_id)
+        self.exact_cache[exact_key] = cached_response
+        return copy.deepcopy(cached_response)
+
+    async def get_rag_response(self, question: str) -> dict:
+        """Answers a question from the caches or the RAG graph and returns it with its sources."""
+        request_id = secrets.token_hex(6)
+        if self._is_trivial(question):
+            return await self._direct_answer(request_id, question)
+
+        exact_key = self._exact_cache_key(question)
+        cached_response = self.exact_cache.get(exact_key)
+        if cached_response is not None:
+            logger.debug("[{}] Exact cache hit.", request_id)
+            return copy.deepcopy(cached_response)
+        logger.debug("[{}] Exact cache miss.", request_id)
+
+        try:
+            question_embedding = await self.embeddings_model.aembed_query(question)
+        except Exception as e:
+            logger.opt(exception=True).error("[{}] Failed to embed the question: {}", request_id, e)
+            return self._error_response()
+
+        cached_response = self._semantic_cache_lookup(request_id, exact_key, question_embedding)
+        if cached_response is not None:
+            return cached_response
+
+        return await self._run_graph(request_id, question, exact_key, question_embedding)
+
+    async def get_rag_responses(self, questions: List[str]) -> List[dict]:
+        """
+        Answers several questions, in order. Questions missing both caches share one embedding
+        request and one Chroma query; their graphs then run concurrently, at most
+        BATCH_MAX_CONCURRENT_QUERIES at a time. Trivial questions are answered directly, meanwhile.
+        """
+        batch_id = secrets.token_hex(6)
+        request_ids = [f"{batch_id}:{i}" for i in range(len(questions))]
+        exact_keys = [self._exact_cache_key(question) for question in questions]
+        responses: List[dict | None] = [None] * len(questions)
+
+        trivial = [i for i, question in enumerate(questions) if self._is_trivial(question)]
+        direct_answers = asyncio.gather(*[self._direct_answer(request_ids[i], questions[i]) for i in trivial])
+
+        # Repeats within the batch are answered once, from their first occurrence.
+        first_occurrence: dict[bytes, int] = {}
+        for i, exact_key in enumerate(exact_keys):
+            first_occurrence.setdefault(exact_key, i)
+            if i in trivial:
+                continue
+            cached_response = self.exact_cache.get(exact_key)
+            if cached_response is not None:
+                responses[i] = copy.deepcopy(cached_response)
+        misses = [
+            i for i, response in enumerate(responses)
+            if response is None and first_occurrence[exact_keys[i]] == i and i not in trivial
+        ]
+        logger.opt(lazy=True).debug(
+            "[{}] Exact cache hits: {}/{}.", lambda: batch_id, lambda: len(questions) - len(misses), lambda: len(questions)
+        )
+
+        if misses:
+            try:
+                embeddings = await self.embeddings_model.aembed_documents([questions[i] for i in misses])
+                question_embeddings = dict(zip(misses, embeddings))
+                for i in misses:
+                    responses[i] = self._semantic_cache_lookup(request_ids[i], exact_keys[i], question_embeddings[i])
+
+                to_retrieve = [i for i in misses if responses[i] is None]
+                retrieved = await self.graph_nodes.query_documents([question_embeddings[i] for i in to_retrieve]) if to_retrieve else []
+            except Exception as e:
+                logger.opt(exception=True).error("[{}] Failed to embed or retrieve documents for the batch: {}", batch_id, e)
+                for i in misses:
+                    responses[i] = self._error_response()
+            else:
+                semaphore = asyncio.Semaphore(settings.BATCH_MAX_CONCURRENT_QUERIES)
+
+                async def answer(i: int, documents: List[Document]) -> dict:
+                    async with semaphore:
+                        return await self._run_graph(
+                            request_ids[i], questions[i], exact_keys[i], question_embeddings[i], documents
+                        )
+
+                answers = await asyncio.gather(*[answer(i, documents) for i, documents in zip(to_retrieve, retrieved)])
+                for i, response in zip(to_retrieve, answers):
+                    responses[i] = response
+
+        for i, response in zip(trivial, await direct_answers):
+            responses[i] = response
+
+        return [
+            response if response is not None else copy.deepcopy(responses[first_occurrence[exact_keys[i]]])
+            for i, response in enumerate(responses)
+        ]
+
+    async def stream_rag_response(self, question: str) -> AsyncIterator[dict]:
+        """
+        Streams the answer to a question as events: "token" events carrying text deltas, a
+        "fallback" event if the streamed answer turned out not to be grounded and a general-
+        knowledge answer follows, then one "sources" event and a final "done" event.
+        Cached answers are sent as a single token event. Failures end the stream with "error".
+        """
+        request_id = secrets.token_hex(6)
+        exact_key = self._exact_cache_key(question)
+        try:
+            if self._is_trivial(question):
+                logger.info("[{}] Trivial question, answering directly.", request_id)
+                async for token in self.graph_nodes.stream_llm(self.graph_nodes.direct_chain, {"question": question}):
+                    yield {"event": "token", "data": token}
+                yield {"event": "sources", "data": []}
+                yield {"event": "done", "data": None}
+                return
+
+            cached_response = self.exact_cache.get(exact_key)
+            if cached_response is None:
+                question_embedding = await self.embeddings_model.aembed_query(question)
+                cached_response = self._semantic_cache_lookup(request_id, exact_key, question_embedding)
+            else:
+                logger.debug("[{}] Exact cache hit.", request_id)
+
+            if cached_response is not None:
+                yield {"event": "token", "data": cached_response["answer"]}
+                yield {"event": "sources", "data": copy.deepcopy(cached_response["sources"])}
+                yield {"event": "done", "data": None}
+                return
+
+            state = await self.graph_nodes.retrieve_documents(
+                {"question": question, "request_id": request_id, "question_embedding": question_embedding}
+            )
+            documents = state["documents"]
+
+            is_grounded = False
+            answer_parts: List[str] = []
+            if documents:
+                inputs = {"context": state["context_str"], "question": question}
+                async for token in self.graph_nodes.stream_llm(self.graph_nodes.stream_generate_chain, inputs):
+                    answer_parts.append(token)
+                    yield {"event": "token", "data": token}
+
+                decision = await self.graph_nodes.invoke_llm(
+                    self.graph_nodes.check_relevance_chain, {**inputs, "generation": "".join(answer_parts)}
+                )
+                is_grounded = decision.is_relevant
+                logger.info("[{}] Relevance check decision: {}", request_id, is_grounded)
+
+            if not is_grounded:
+                yield {"event": "fallback", "data": None}
+                answer_parts = []
+                async for token in self.graph_nodes.stream_llm(self.graph_nodes.rewrite_chain, {"question": question}):
+                    answer_parts.append(token)
+                    yield {"event": "token", "data": token}
+
+            response = self._build_response("".join(answer_parts), documents)
+            if is_grounded:
+                self._cache_response(exact_key, question_embedding, response)
+            yield {"event": "sources", "data": response["sources"]}
+            yield {"event": "done", "data": None}
+
+        except Exception as e:
+            logger.opt(exception=True).error("[{}] An error occurred while streaming the RAG response: {}", request_id, e)
+            yield {"event": "error", "data": "An internal error prevented the request from completing."}
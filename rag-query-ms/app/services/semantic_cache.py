@@ -0,0 +1,56 @@
+import time
+from typing import Any, List
+
+import numpy as np
+
+
+class SemanticCache:
+    """
+    Remembers recent RAG responses by the embedding of their question. A new question whose
+    cosine similarity to a cached one reaches the threshold gets that response back, without
+    touching Chroma or the LLM.
+
+    Embeddings are stored normalized in a preallocated float32 matrix used as a ring buffer,
+    so a lookup is a single matrix-vector product. Lookups and inserts never await, so the
+    cache needs no lock while it is only used from the event loop.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, threshold: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.threshold = threshold
+        self._embeddings: np.ndarray | None = None
+        self._expires_at = np.zeros(max_entries, dtype=np.float64)
+        self._responses: List[Any] = [None] * max_entries
+        self._size = 0
+        self._next = 0
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, embedding: List[float]) -> Any | None:
+        """Returns the response cached for the most similar live question, if it is similar enough."""
+        if not self._size:
+            return None
+
+        similarities = self._embeddings[:self._size] @ self._normalize(embedding)
+        similarities[self._expires_at[:self._size] <= time.monotonic()] = -np.inf
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.threshold:
+            return None
+        return self._responses[best]
+
+    def add(self, embedding: List[float], response: Any):
+        """Caches a response, overwriting the oldest entry once the cache is full."""
+        vector = self._normalize(embedding)
+        if self._embeddings is None:
+            self._embeddings = np.zeros((self.max_entries, vector.shape[0]), dtype=np.float32)
+
+        self._embeddings[self._next] = vector
+        self._expires_at[self._next] = time.monotonic() + self.ttl_seconds
+        self._responses[self._next] = response
+        self._next = (self._next + 1) % self.max_entries
+        self._size = min(self._size + 1, self.max_entries)
@@ -0,0 +1,123 @@
+import json
+
+from httpx import ASGITransport, AsyncClient
+import pytest
+import pytest_asyncio
+
+from app.core.config import settings
+from app.core.dependencies import get_rag_service
+from app.main import app
+from app.services.rag_service import RAGService
+
+pytestmark = pytest.mark.asyncio
+
+
+@pytest.fixture
+def rag_service(mocker):
+    service = mocker.AsyncMock(spec=RAGService)
+    app.dependency_overrides[get_rag_service] = lambda: service
+    yield service
+    app.dependency_overrides.clear()
+
+@pytest_asyncio.fixture
+async def client(rag_service):
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test/api/v1") as ac:
+        yield ac
+
+def answer(text: str) -> dict:
+    return {"answer": text, "sources": [{"filename": "a.pdf", "page_content_snippet": "chunk..."}]}
+
+async def test_batch_returns_results_in_question_order(client: AsyncClient, rag_service):
+    rag_service.get_rag_responses.return_value = [answer("first"), answer("second")]
+
+    response = await client.post("/query/batch", json={"questions": [" First? ", "Second?"]})
+
+    assert response.status_code == 200
+    assert [result["answer"] for result in response.json()["results"]] == ["first", "second"]
+    rag_service.get_rag_responses.assert_awaited_once_with(["First?", "Second?"])
+
+def failure() -> dict:
+    return {"answer": "Sorry", "sources": [], "error": "An internal error prevented the request from completing."}
+
+async def test_batch_reports_failed_questions_per_result(client: AsyncClient, rag_service):
+    rag_service.get_rag_responses.return_value = [answer("first"), failure()]
+
+    response = await client.post("/query/batch", json={"questions": ["First?", "Second?"]})
+
+    assert response.status_code == 200
+    first, second = response.json()["results"]
+    assert first["answer"] == "first" and first["error"] is None
+    assert second == {
+        "answer": "Sorry",
+        "sources": [],
+        "error": "An internal error prevented the request from completing."
+    }
+
+async def test_batch_fails_if_every_question_failed(client: AsyncClient, rag_service):
+    rag_service.get_rag_responses.return_value = [failure(), failure()]
+
+    response = await client.post("/query/batch", json={"questions": ["First?", "Second?"]})
+
+    assert response.status_code == 500
+    assert response.json() == {"detail": "An internal error occurred while processing the query."}
+
+async def test_batch_rejects_too_many_questions(client: AsyncClient, rag_service):
+    questions = [f"Question {i}?" for i in range(settings.BATCH_MAX_QUESTIONS + 1)]
+
+    response = await client.post("/query/batch", json={"questions": questions})
+
+    assert response.status_code == 422
+    rag_service.get_rag_responses.assert_not_awaited()
+
+@pytest.fixture
+def streaming_client(collection, embeddings_model, llm):
+    service = RAGService(collection=collection, embeddings_model=embeddings_model, llm=llm, semantic_cache=None)
+    app.dependency_overrides[get_rag_service] = lambda: service
+    yield AsyncClient(transport=ASGITransport(app=app), base_url="http://test/api/v1")
+    app.dependency_overrides.clear()
+
+def parse_events(body: str) -> list[tuple[str, object]]:
+    events = []
+    for frame in body.split("\n\n")[:-1]:
+        event_line, data_line = frame.split("\n")
+        assert event_line.startswith("event: ") and data_line.startswith("data: ")
+        events.append((event_line.removeprefix("event: "), json.loads(data_line.removeprefix("data: "))))
+    return events
+
+async def test_stream_sends_tokens_then_sources_then_done(streaming_client: AsyncClient):
+    async with streaming_client as client:
+        response = await client.post("/query/stream", json={"question": "What is in the report?"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert response.text.endswith("\n\n")
+    events = parse_events(response.text)
+    names = [name for name, _ in events]
+    assert names == ["token"] * (len(names) - 2) + ["sources", "done"]
+    assert "".join(data for name, data in events if name == "token") == "plain answer"
+    assert events[-2] == ("sources", [{"filename": "a.pdf", "page_content_snippet": "chunk..."}])
+    assert events[-1] == ("done", None)
+
+async def test_stream_marks_the_fallback_answer(streaming_client: AsyncClient, llm):
+    llm.structured["RelevanceDecision"] = {"is_relevant": False}
+
+    async with streaming_client as client:
+        response = await client.post("/query/stream", json={"question": "What is in the report?"})
+
+    names = [name for name, _ in parse_events(response.text)]
+    assert names.count("fallback") == 1
+    fallback = names.index("fallback")
+    assert set(names[:fallback]) == {"token"}
+    assert set(names[fallback + 1:-2]) == {"token"}
+    assert names[-2:] == ["sources", "done"]
+
+async def test_stream_ends_with_an_error_event_on_failure(streaming_client: AsyncClient, embeddings_model):
+    embeddings_model.aembed_query.side_effect = RuntimeError('{"error": "quota"}')
+
+    async with streaming_client as client:
+        response = await client.post("/query/stream", json={"question": "What is in the report?"})
+
+    assert response.status_code == 200
+    assert parse_events(response.text) == [
+        ("error", "An internal error prevented the request from completing.")
+    ]
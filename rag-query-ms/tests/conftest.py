@@ -0,0 +1,50 @@
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.runnables import RunnableLambda
+import pytest
+
+from app.services.rag_service import RAGService
+from app.services.semantic_cache import SemanticCache
+
+
+class FakeLLM(FakeListChatModel):
+    """Plain-text calls return the listed responses in turn; structured calls build the schema from `structured`."""
+
+    structured: dict = {}
+
+    def with_structured_output(self, schema, **kwargs):
+        return RunnableLambda(lambda _: schema(**self.structured[schema.__name__]))
+
+@pytest.fixture
+def llm():
+    return FakeLLM(
+        responses=["plain answer"],
+        structured={
+            "GroundedAnswer": {"answer": "grounded answer", "is_grounded": True},
+            "RelevanceDecision": {"is_relevant": True},
+        }
+    )
+
+@pytest.fixture
+def collection(mocker):
+    collection = mocker.AsyncMock()
+    collection.query.side_effect = lambda query_embeddings, **kwargs: {
+        "documents": [["chunk text"] for _ in query_embeddings],
+        "metadatas": [[{"original_filename": "a.pdf", "snippet": "chunk..."}] for _ in query_embeddings],
+    }
+    return collection
+
+@pytest.fixture
+def embeddings_model(mocker):
+    embeddings_model = mocker.AsyncMock()
+    embeddings_model.aembed_query.side_effect = lambda text: [float(len(text)), 1.0]
+    embeddings_model.aembed_documents.side_effect = lambda texts: [[float(len(text)), 1.0] for text in texts]
+    return embeddings_model
+
+@pytest.fixture
+def rag_service(collection, embeddings_model, llm):
+    return RAGService(
+        collection=collection,
+        embeddings_model=embeddings_model,
+        llm=llm,
+        semantic_cache=SemanticCache(max_entries=8, ttl_seconds=600, threshold=0.95)
+    )
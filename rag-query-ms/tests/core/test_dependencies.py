@@ -0,0 +1,31 @@
+from unittest.mock import AsyncMock
+
+import pytest
+
+from app.core import dependencies
+
+
+@pytest.mark.asyncio
+async def test_create_chroma_collection_waits_for_chroma(mocker):
+    mocker.patch.object(dependencies.get_settings(), "CHROMA_CONNECT_ATTEMPTS", 3)
+    mocker.patch.object(dependencies.get_settings(), "CHROMA_CONNECT_BACKOFF_SECONDS", 2.0)
+    sleep = mocker.patch("app.core.dependencies.asyncio.sleep", new=AsyncMock())
+    client = AsyncMock()
+    client.heartbeat.side_effect = [ConnectionError("refused"), ConnectionError("refused"), None]
+    client.get_or_create_collection.return_value = "collection"
+    mocker.patch("app.core.dependencies.chromadb.AsyncHttpClient", new=AsyncMock(return_value=client))
+
+    assert await dependencies.create_chroma_collection() == "collection"
+    assert [call.args[0] for call in sleep.await_args_list] == [2.0, 4.0]
+
+@pytest.mark.asyncio
+async def test_create_chroma_collection_gives_up_after_the_last_attempt(mocker):
+    mocker.patch.object(dependencies.get_settings(), "CHROMA_CONNECT_ATTEMPTS", 2)
+    mocker.patch("app.core.dependencies.asyncio.sleep", new=AsyncMock())
+    connect = mocker.patch(
+        "app.core.dependencies.chromadb.AsyncHttpClient", new=AsyncMock(side_effect=ConnectionError("refused"))
+    )
+
+    with pytest.raises(ConnectionError):
+        await dependencies.create_chroma_collection()
+    assert connect.await_count == 2
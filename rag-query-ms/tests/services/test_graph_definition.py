@@ -0,0 +1,135 @@
+import asyncio
+
+from langchain_core.documents import Document
+import pytest
+
+from app.services.graph_definition import GroundedAnswer, RAGGraphNodes
+
+
+class FakeChain:
+    """Answers every ainvoke with `result`, optionally waiting for `release` first."""
+
+    def __init__(self, result, release: asyncio.Event | None = None):
+        self.result = result
+        self.release = release
+        self.calls = 0
+        self.cancelled = False
+
+    async def ainvoke(self, inputs):
+        self.calls += 1
+        try:
+            await asyncio.sleep(0)
+            if self.release is not None:
+                await self.release.wait()
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        return self.result
+
+@pytest.fixture
+def nodes(collection, llm):
+    return RAGGraphNodes(collection, llm)
+
+def state(**values) -> dict:
+    return {"request_id": "test", "question": "What is in the report?", "context_str": "chunk text", **values}
+
+
+@pytest.mark.asyncio
+async def test_speculative_rewrite_is_used_when_the_answer_is_not_grounded(nodes, mocker):
+    mocker.patch("app.services.graph_definition.settings.SPECULATIVE_REWRITE", True)
+    nodes.generate_chain = FakeChain(GroundedAnswer(answer="guess", is_grounded=False))
+    nodes.rewrite_chain = FakeChain("general answer")
+
+    generated = await nodes.generate_answer(state(documents=[]))
+    rewritten = await nodes.rewrite_answer(state(**generated))
+
+    assert generated["fallback_generation"] == "general answer"
+    assert rewritten == {"generation": "general answer", "used_fallback": True}
+    assert nodes.rewrite_chain.calls == 1
+
+@pytest.mark.asyncio
+async def test_speculative_rewrite_is_cancelled_when_the_answer_is_grounded(nodes, mocker):
+    mocker.patch("app.services.graph_definition.settings.SPECULATIVE_REWRITE", True)
+    nodes.generate_chain = FakeChain(GroundedAnswer(answer="grounded", is_grounded=True))
+    nodes.rewrite_chain = FakeChain("general answer", release=asyncio.Event())
+
+    generated = await nodes.generate_answer(state(documents=[]))
+    await asyncio.sleep(0)
+
+    assert generated == {"generation": "grounded", "is_grounded": True}
+    assert nodes.rewrite_chain.cancelled
+
+@pytest.mark.asyncio
+async def test_rewrite_runs_after_generation_without_speculation(nodes, mocker):
+    mocker.patch("app.services.graph_definition.settings.SPECULATIVE_REWRITE", False)
+    nodes.generate_chain = FakeChain(GroundedAnswer(answer="guess", is_grounded=False))
+    nodes.rewrite_chain = FakeChain("general answer")
+
+    generated = await nodes.generate_answer(state(documents=[]))
+    assert "fallback_generation" not in generated
+    assert nodes.rewrite_chain.calls == 0
+
+    rewritten = await nodes.rewrite_answer(state(**generated))
+    assert rewritten["generation"] == "general answer"
+    assert nodes.rewrite_chain.calls == 1
+
+def test_check_retrieval_routes_empty_retrievals_to_the_fallback(nodes):
+    assert nodes.check_retrieval(state(documents=[])) == "no_documents"
+    assert nodes.check_retrieval(state(documents=[Document(page_content="chunk text")])) == "has_documents"
+
+def test_check_relevance_routes_on_the_grounding_judgment(nodes):
+    assert nodes.check_relevance(state(is_grounded=True)) == "useful"
+    assert nodes.check_relevance(state(is_grounded=False)) == "not_useful"
+
+@pytest.mark.asyncio
+async def test_retrieval_fills_in_snippets_missing_from_older_chunks(nodes, collection, mocker):
+    mocker.patch("app.services.graph_definition.settings.SNIPPET_LENGTH", 5)
+    collection.query.side_effect = lambda query_embeddings, **kwargs: {
+        "documents": [["older chunk text", "newer chunk text"]],
+        "metadatas": [[{"original_filename": "old.pdf"}, {"original_filename": "new.pdf", "snippet": "stored..."}]],
+    }
+
+    retrieved = await nodes.retrieve_documents(state(question_embedding=[1.0, 0.0]))
+
+    assert [doc.metadata["snippet"] for doc in retrieved["documents"]] == ["older...", "stored..."]
+
+@pytest.mark.asyncio
+async def test_empty_retrieval_skips_generation(rag_service, collection):
+    collection.query.side_effect = lambda query_embeddings, **kwargs: {
+        "documents": [[] for _ in query_embeddings], "metadatas": [[] for _ in query_embeddings]
+    }
+    rag_service.graph_nodes.generate_chain = FakeChain(GroundedAnswer(answer="grounded", is_grounded=True))
+
+    response = await rag_service.get_rag_response("What is in the report?")
+
+    assert response == {"answer": "plain answer", "sources": []}
+    assert rag_service.graph_nodes.generate_chain.calls == 0
+
+@pytest.mark.asyncio
+async def test_ungrounded_answer_is_replaced_by_the_fallback(rag_service, llm):
+    llm.structured["GroundedAnswer"] = {"answer": "guess", "is_grounded": False}
+
+    response = await rag_service.get_rag_response("What is in the report?")
+
+    assert response["answer"] == "plain answer"
+    assert response["sources"] == [{"filename": "a.pdf", "page_content_snippet": "chunk..."}]
+
+@pytest.mark.asyncio
+async def test_llm_semaphore_caps_concurrent_calls(collection, llm, mocker):
+    mocker.patch("app.services.graph_definition.settings.MAX_CONCURRENT_LLM_CALLS", 2)
+    nodes = RAGGraphNodes(collection, llm)
+    in_flight, peak = 0, 0
+
+    class CountingChain:
+        async def ainvoke(self, inputs):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return inputs
+
+    results = await asyncio.gather(*[nodes.invoke_llm(CountingChain(), i) for i in range(6)])
+
+    assert results == list(range(6))
+    assert peak == 2
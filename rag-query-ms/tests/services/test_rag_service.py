@@ -0,0 +1,125 @@
+import pytest
+
+from app.services.rag_service import RAGService
+
+
+@pytest.mark.asyncio
+async def test_stream_yields_error_event_when_a_call_fails(rag_service, embeddings_model):
+    embeddings_model.aembed_query.side_effect = RuntimeError('{"error": {"code": 429}}')
+
+    events = [event async for event in rag_service.stream_rag_response("What is in the report?")]
+
+    assert events == [{"event": "error", "data": "An internal error prevented the request from completing."}]
+
+@pytest.mark.asyncio
+async def test_exact_repeat_skips_embedding_and_retrieval(rag_service, embeddings_model, collection):
+    first = await rag_service.get_rag_response("What is in the report?")
+
+    second = await rag_service.get_rag_response("  WHAT IS IN THE REPORT?  ")
+
+    assert second == first
+    assert embeddings_model.aembed_query.await_count == 1
+    assert collection.query.await_count == 1
+
+def test_exact_cache_key_ignores_case_and_surrounding_whitespace():
+    key = RAGService._exact_cache_key("What is in the report?")
+
+    assert RAGService._exact_cache_key("\twhat IS in the Report? ") == key
+    assert RAGService._exact_cache_key("What is in the reports?") != key
+
+@pytest.mark.asyncio
+async def test_exact_cache_hit_is_a_copy(rag_service):
+    first = await rag_service.get_rag_response("What is in the report?")
+    first["answer"] = "changed"
+    first["sources"][0]["filename"] = "changed.pdf"
+
+    second = await rag_service.get_rag_response("What is in the report?")
+    second["sources"].clear()
+
+    third = await rag_service.get_rag_response("What is in the report?")
+    assert third == {"answer": "grounded answer", "sources": [{"filename": "a.pdf", "page_content_snippet": "chunk..."}]}
+
+@pytest.mark.asyncio
+async def test_fallback_answer_is_not_cached(rag_service, llm, collection):
+    llm.structured["GroundedAnswer"] = {"answer": "ungrounded answer", "is_grounded": False}
+
+    first = await rag_service.get_rag_response("What is in the report?")
+    await rag_service.get_rag_response("What is in the report?")
+
+    assert first["answer"] == "plain answer"
+    assert len(rag_service.exact_cache) == 0
+    assert collection.query.await_count == 2
+
+@pytest.mark.asyncio
+async def test_similar_question_is_answered_from_the_semantic_cache(rag_service, embeddings_model, collection):
+    await rag_service.get_rag_response("What is in the report?")
+    embeddings_model.aembed_query.side_effect = lambda text: [22.0, 1.0]
+
+    response = await rag_service.get_rag_response("What's in the report?")
+
+    assert response["answer"] == "grounded answer"
+    assert collection.query.await_count == 1
+
+@pytest.mark.asyncio
+async def test_semantic_cache_can_be_disabled(rag_service, embeddings_model, collection):
+    rag_service.semantic_cache = None
+    await rag_service.get_rag_response("What is in the report?")
+    embeddings_model.aembed_query.side_effect = lambda text: [22.0, 1.0]
+
+    await rag_service.get_rag_response("What's in the report?")
+
+    assert collection.query.await_count == 2
+
+@pytest.mark.asyncio
+async def test_batch_answers_in_order_and_embeds_repeats_once(rag_service, embeddings_model, collection):
+    questions = ["First question?", "Second one?", "first question? "]
+
+    responses = await rag_service.get_rag_responses(questions)
+
+    assert [response["answer"] for response in responses] == ["grounded answer"] * 3
+    assert responses[0] == responses[2]
+    embeddings_model.aembed_documents.assert_awaited_once_with(["First question?", "Second one?"])
+    assert len(collection.query.await_args.kwargs["query_embeddings"]) == 2
+
+@pytest.mark.asyncio
+async def test_batch_reports_only_the_question_that_failed(rag_service, mocker):
+    async def generate(inputs):
+        if inputs["question"] == "Bad question?":
+            raise RuntimeError('{"error": "quota"}')
+        return mocker.Mock(answer=f"answer to {inputs['question']}", is_grounded=True)
+    rag_service.graph_nodes.generate_chain = mocker.Mock(ainvoke=generate)
+
+    responses = await rag_service.get_rag_responses(["Good question?", "Bad question?"])
+
+    assert responses[0]["answer"] == "answer to Good question?"
+    assert "error" not in responses[0]
+    assert "error" in responses[1]
+
+@pytest.mark.asyncio
+async def test_batch_wide_failure_answers_every_question_with_an_error(rag_service, embeddings_model):
+    embeddings_model.aembed_documents.side_effect = RuntimeError('{"error": "quota"}')
+
+    responses = await rag_service.get_rag_responses(["First question?", "Second one?", "FIRST QUESTION?"])
+
+    assert all("error" in response for response in responses)
+
+@pytest.mark.parametrize("question", ["hi", "Hello there!", "thanks", "Thank you very much!!", "good morning", "bye."])
+def test_greetings_and_thanks_are_trivial(question):
+    assert RAGService._is_trivial(question)
+
+@pytest.mark.parametrize("question", [
+    "hi, what does the contract say about fees?",
+    "thanks, and what about the 2023 revenue?",
+    "history of the project",
+    "Hey, summarize the report",
+])
+def test_questions_starting_with_a_greeting_are_not_trivial(question):
+    assert not RAGService._is_trivial(question)
+
+@pytest.mark.asyncio
+async def test_trivial_question_skips_embedding_and_retrieval(rag_service, embeddings_model, collection):
+    response = await rag_service.get_rag_response("Thanks!")
+
+    assert response == {"answer": "plain answer", "sources": []}
+    embeddings_model.aembed_query.assert_not_awaited()
+    collection.query.assert_not_awaited()
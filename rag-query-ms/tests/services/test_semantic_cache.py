@@ -0,0 +1,48 @@
+from app.services.semantic_cache import SemanticCache
+
+
+def test_lookup_on_empty_cache_misses():
+    cache = SemanticCache(max_entries=2, ttl_seconds=60, threshold=0.9)
+
+    assert cache.lookup([1.0, 0.0]) is None
+
+def test_similarity_at_threshold_hits_and_below_misses():
+    cache = SemanticCache(max_entries=2, ttl_seconds=60, threshold=1.0)
+    cache.add([1.0, 0.0], "answer")
+
+    # Same direction, different length: cosine similarity is exactly 1.
+    assert cache.lookup([3.0, 0.0]) == "answer"
+    assert cache.lookup([1.0, 0.01]) is None
+
+    cache.threshold = 0.7
+    assert cache.lookup([1.0, 1.0]) == "answer"
+    cache.threshold = 0.71
+    assert cache.lookup([1.0, 1.0]) is None
+
+def test_lookup_returns_the_most_similar_entry():
+    cache = SemanticCache(max_entries=4, ttl_seconds=60, threshold=0.5)
+    cache.add([1.0, 0.0], "east")
+    cache.add([0.0, 1.0], "north")
+
+    assert cache.lookup([0.9, 0.1]) == "east"
+    assert cache.lookup([0.1, 0.9]) == "north"
+
+def test_full_cache_overwrites_the_oldest_entry():
+    cache = SemanticCache(max_entries=2, ttl_seconds=60, threshold=0.99)
+    cache.add([1.0, 0.0], "first")
+    cache.add([0.0, 1.0], "second")
+    cache.add([-1.0, 0.0], "third")
+
+    assert cache.lookup([1.0, 0.0]) is None
+    assert cache.lookup([0.0, 1.0]) == "second"
+    assert cache.lookup([-1.0, 0.0]) == "third"
+
+def test_expired_entries_are_ignored(mocker):
+    monotonic = mocker.patch("app.services.semantic_cache.time.monotonic", return_value=100.0)
+    cache = SemanticCache(max_entries=2, ttl_seconds=60, threshold=0.99)
+    cache.add([1.0, 0.0], "answer")
+
+    monotonic.return_value = 159.0
+    assert cache.lookup([1.0, 0.0]) == "answer"
+    monotonic.return_value = 160.0
+    assert cache.lookup([1.0, 0.0]) is None